@@ -22,6 +22,7 @@ if not exist "languages.json" set "MISSING_FILES=%MISSING_FILES% languages.json"
 if not exist "settings.json" set "MISSING_FILES=%MISSING_FILES% settings.json"
 if not exist "custom_widgets.py" set "MISSING_FILES=%MISSING_FILES% custom_widgets.py"
 if not exist "gui_logic.py" set "MISSING_FILES=%MISSING_FILES% gui_logic.py"
+if not exist "engine\__init__.py" set "MISSING_FILES=%MISSING_FILES% engine\__init__.py"
 
 
 if not "%MISSING_FILES%"=="" (
@@ -67,6 +68,7 @@ if exist ImageAutoclicker.spec (
     --hidden-import keyboard ^
     --hidden-import custom_widgets ^
     --hidden-import gui_logic ^
+    --hidden-import engine ^
     main.py
 
 :: Проверяем, успешно ли прошла сборка
@@ -0,0 +1,12 @@
+from .config import EngineConfig, DEFAULT_DETECTION_SETTINGS, DEFAULT_CLICK_CONDITIONS, MATCH_THRESHOLD
+from .template_cache import Template, TemplateCache
+from .detection import Frame, Detection, Detections, capture_frame
+
+
+def __getattr__(name):
+    # Движок импортируется по первому обращению: python -m engine.recorder и другие
+    # утилиты пакета не должны загружать модули, которые сами запускают
+    if name in ("DetectionEngine", "CycleResult", "EngineStats", "find_default_monitor"):
+        from . import core
+        return getattr(core, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
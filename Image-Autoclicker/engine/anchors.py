@@ -0,0 +1,96 @@
+import logging
+import numpy as np
+import cv2
+from .detection import Detections, build_pyramid, usable_pyramid_levels, match_template, match_template_windows
+
+# Предфильтр перед корреляцией: пары "яркий/тёмный" пиксель шаблона должны
+# сохранять порядок яркости в кадре. Сравнение порядка не зависит от яркости и контраста
+ANCHOR_PAIRS = 32
+ANCHOR_MASK_PAIRS = 8
+ANCHOR_MIN_CONTRAST = 24
+ANCHOR_MIN_AGREEMENT = 0.8
+ANCHOR_MAX_WINDOW_SHARE = 0.25
+
+
+def spread_points(order, width, cell, count):
+    points = []
+    cells = set()
+    for index in order:
+        y, x = divmod(int(index), width)
+        if (y // cell, x // cell) in cells:
+            continue
+        cells.add((y // cell, x // cell))
+        points.append((y, x))
+        if len(points) >= count:
+            break
+    return points
+
+
+def anchor_pairs(image, count, mask=None):
+    # Самые светлые и самые тёмные точки, разнесённые по шаблону; сильные пары первыми
+    height, width = image.shape
+    cell = max(1, min(width, height) // 6)
+    order = np.argsort(image, axis=None, kind="stable")
+    if mask is not None:
+        order = order[mask.ravel()[order] > 0]
+    dark = spread_points(order, width, cell, count)
+    bright = spread_points(order[::-1], width, cell, count)
+    pairs = []
+    for (by, bx), (dy, dx) in zip(bright, dark):
+        contrast = int(image[by, bx]) - int(image[dy, dx])
+        if contrast >= ANCHOR_MIN_CONTRAST:
+            pairs.append((contrast, by, bx, dy, dx))
+    # Однотонному шаблону предфильтр не поможет
+    if len(pairs) < ANCHOR_MASK_PAIRS:
+        return None
+    pairs.sort(reverse=True)
+    return tuple(np.array([pair[i] for pair in pairs], np.intp) for i in range(1, 5))
+
+
+def match_template_anchored(frame, template, threshold, max_detections, buffers=None):
+    level = usable_pyramid_levels(frame, template, 1)
+    anchors = template.derived(("anchors", level), lambda template: anchor_pairs(
+        template.pyramid(level)[level], ANCHOR_PAIRS, None if template.mask is None else template.masked(level)[1]))
+    if anchors is None:
+        return match_template(frame, template, threshold, max_detections, buffers)
+
+    # Кандидаты ищутся на уменьшенном кадре: он вчетверо меньше и сглажен
+    image = build_pyramid(frame, level, buffers)[level]
+    template_height, template_width = template.pyramid(level)[level].shape
+    result_height = image.shape[0] - template_height + 1
+    result_width = image.shape[1] - template_width + 1
+    bright_y, bright_x, dark_y, dark_x = anchors
+    mask = None
+    for i in range(ANCHOR_MASK_PAIRS):
+        bright = image[bright_y[i]:bright_y[i] + result_height, bright_x[i]:bright_x[i] + result_width]
+        dark = image[dark_y[i]:dark_y[i] + result_height, dark_x[i]:dark_x[i] + result_width]
+        agree = cv2.compare(bright, dark, cv2.CMP_GT)
+        mask = agree if mask is None else cv2.bitwise_and(mask, agree, dst=mask)
+    ys, xs = np.nonzero(mask)
+    rest = len(bright_y) - ANCHOR_MASK_PAIRS
+    if rest and len(ys):
+        votes = np.zeros(len(ys), np.int32)
+        for i in range(ANCHOR_MASK_PAIRS, len(bright_y)):
+            votes += image[ys + bright_y[i], xs + bright_x[i]] > image[ys + dark_y[i], xs + dark_x[i]]
+        keep = votes >= ANCHOR_MIN_AGREEMENT * rest
+        ys, xs = ys[keep], xs[keep]
+    if not len(ys):
+        return Detections()
+
+    # Полная корреляция только в окнах вокруг кандидатов, по окну на клетку размером с шаблон
+    scale = 1 << level
+    pad = scale + 1
+    cells = set(zip(((ys * scale) // template.height).tolist(), ((xs * scale) // template.width).tolist()))
+    windows = []
+    area = 0
+    for cell_y, cell_x in cells:
+        x0 = max(0, cell_x * template.width - pad)
+        y0 = max(0, cell_y * template.height - pad)
+        x1 = min(frame.width, (cell_x + 2) * template.width + pad)
+        y1 = min(frame.height, (cell_y + 2) * template.height + pad)
+        windows.append((x0, y0, x1, y1))
+        area += (x1 - x0) * (y1 - y0)
+    if area > ANCHOR_MAX_WINDOW_SHARE * frame.width * frame.height:
+        logging.debug(f"Anchor prefilter of {template.path} kept {len(ys)} candidates, matching the whole frame")
+        return match_template(frame, template, threshold, max_detections, buffers)
+    return match_template_windows(frame, template, threshold, max_detections, windows)
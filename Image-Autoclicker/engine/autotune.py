@@ -0,0 +1,169 @@
+import time
+import logging
+import threading
+from collections import deque
+from .detection import Frame, match_template, match_template_pyramid
+from .exact_matching import match_exact
+from .anchors import match_template_anchored
+
+AUTOTUNE_STRATEGIES = ("full", "pyramid", "anchors", "exact")
+
+
+def match_with(strategy, frame, template, threshold, max_detections, detection, tolerance, buffers=None):
+    if strategy == "exact":
+        return match_exact(frame, template, tolerance, threshold, max_detections)
+    if strategy == "pyramid":
+        return match_template_pyramid(frame, template, threshold, detection["pyramid_levels"],
+                                      detection["pyramid_candidates"], max_detections, buffers)
+    if strategy == "anchors":
+        return match_template_anchored(frame, template, threshold, max_detections, buffers)
+    return match_template(frame, template, threshold, max_detections, buffers)
+
+
+def same_detections(expected, found, template):
+    if len(expected) != len(found):
+        return False
+    radius_x, radius_y = template.width // 2, template.height // 2
+    return all(any(abs(e.x - f.x) <= radius_x and abs(e.y - f.y) <= radius_y for f in found) for e in expected)
+
+
+class Autotuner:
+    # Стратегия поиска выбирается для каждого шаблона замером на недавних кадрах:
+    # самая быстрая из тех, что находят то же, что полный поиск. Выбор хранится
+    # в шаблоне по размеру кадра, поэтому перезагрузка шаблона или другой размер
+    # экрана приводят к новому замеру. Замеры идут в отдельном потоке по одному
+    # шаблону, вне пула сопоставления; пока замер не готов, шаблон ищется как обычно
+    def __init__(self, strategies, sample_frames=3, sample_every=10):
+        self.strategies = [strategy for strategy in strategies if strategy in AUTOTUNE_STRATEGIES] or ["full"]
+        self.sample_frames = sample_frames
+        self.sample_every = max(1, sample_every)
+        self.tunings = 0
+        self._samples = {}
+        self._observed = 0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._queue = deque()
+        self._pending = set()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="autotune", daemon=True)
+        self._thread.start()
+
+    def seed(self, grays):
+        for gray in grays:
+            self._add(gray)
+
+    def _add(self, gray):
+        # Кадры из FrameBuffers перезаписываются, поэтому храним копии
+        height, width = gray.shape[:2]
+        frame = Frame({"left": 0, "top": 0, "width": width, "height": height}, gray.copy(), 0.0)
+        with self._lock:
+            samples = self._samples.get((height, width))
+            if samples is None:
+                samples = self._samples[(height, width)] = deque(maxlen=self.sample_frames)
+            samples.append(frame)
+
+    def observe(self, frame):
+        with self._lock:
+            due = self._observed % self.sample_every == 0
+            self._observed += 1
+        if due:
+            self._add(frame.gray)
+
+    def strategy_for(self, frame, template, threshold, max_detections, detection, tolerance):
+        geometry = (frame.height, frame.width)
+        choices = template.derived("autotune", lambda template: {})
+        with self._condition:
+            if geometry in choices:
+                return choices[geometry]
+            if (template, geometry) in self._pending or not self._running:
+                return None
+            self._pending.add((template, geometry))
+            samples = list(self._samples.get(geometry, ()))
+        # Кадр из FrameBuffers перезапишется раньше, чем до него дойдёт замер
+        current = Frame(frame.region, frame.gray.copy(), frame.timestamp)
+        with self._condition:
+            self._queue.append((template, geometry, [current] + samples,
+                                (threshold, max_detections, detection, tolerance)))
+            self._condition.notify_all()
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                template, geometry, frames, options = self._queue.popleft()
+            try:
+                choice = self.tune(frames, template, *options)
+            except Exception as e:
+                logging.error(f"Autotune of {template.path} failed: {e}")
+                choice = None
+            choices = template.derived("autotune", lambda template: {})
+            with self._condition:
+                choices[geometry] = choice
+                self.tunings += 1
+                self._pending.discard((template, geometry))
+                self._condition.notify_all()
+
+    def join(self, timeout=None):
+        # Дождаться всех начатых замеров
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending or not self._running, timeout)
+
+    def close(self):
+        with self._condition:
+            self._running = False
+            self._queue.clear()
+            self._condition.notify_all()
+        self._thread.join(timeout=1.0)
+
+    def update(self, frame, template, found):
+        # Шаблона не было на пробных кадрах - настраиваем заново, когда он появится
+        if not found:
+            return
+        choices = template.derived("autotune", lambda template: {})
+        geometry = (frame.height, frame.width)
+        with self._lock:
+            if geometry not in choices or choices[geometry] is not None:
+                return
+            del choices[geometry]
+        self._add(frame.gray)
+
+    def tune(self, frames, template, threshold, max_detections, detection, tolerance):
+        frames = [frame for frame in frames if template.width <= frame.width and template.height <= frame.height]
+        if not frames:
+            return None
+
+        def measure(strategy):
+            # Первый вызов считает подписи и пирамиды шаблона, в замер он не входит.
+            # Берём лучшее время по кадрам: оно меньше зависит от других потоков
+            match_with(strategy, frames[0], template, threshold, max_detections, detection, tolerance)
+            found, seconds = [], []
+            for frame in frames:
+                started = time.perf_counter()
+                found.append(match_with(strategy, frame, template, threshold, max_detections, detection, tolerance))
+                seconds.append(time.perf_counter() - started)
+            return found, min(seconds)
+
+        reference, reference_seconds = measure("full")
+        if not any(reference):
+            logging.debug(f"Autotune of {template.path}: not on the sample frames yet, using the default search")
+            return None
+        timings = {}
+        if "full" in self.strategies:
+            timings["full"] = reference_seconds
+        for strategy in self.strategies:
+            if strategy == "full":
+                continue
+            found, seconds = measure(strategy)
+            if all(same_detections(expected, detections, template) for expected, detections in zip(reference, found)):
+                timings[strategy] = seconds
+        if not timings:
+            return None
+        choice = min(timings, key=timings.get)
+        logging.info(f"Autotune of {template.path} on {frames[0].width}x{frames[0].height}: {choice} ("
+                     + ", ".join(f"{strategy} {seconds * 1000:.1f}ms" for strategy, seconds in timings.items())
+                     + f", {len(frames)} frame(s))")
+        return choice
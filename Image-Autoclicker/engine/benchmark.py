@@ -0,0 +1,172 @@
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import cv2
+from .config import EngineConfig
+from .detection import Frame
+from .core import DetectionEngine
+from .synthetic import SyntheticScene, make_sprite
+
+# Бенчмарк не требует дисплея: кадры генерируются, а не снимаются с экрана
+
+RESOLUTIONS = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160)
+}
+
+STRATEGIES = ["full", "pyramid", "tiles", "tracking", "exact", "anchors", "multiscale", "channels", "histogram",
+              "autotune"]
+
+
+def score_detections(detections, truth, template):
+    tolerance = max(template.width, template.height) / 2
+    unmatched = list(truth)
+    true_positives = 0
+    for detection in detections:
+        for point in unmatched:
+            if abs(detection.x - point[0]) <= tolerance and abs(detection.y - point[1]) <= tolerance:
+                unmatched.remove(point)
+                true_positives += 1
+                break
+    return true_positives, len(detections) - true_positives, len(unmatched)
+
+
+STRATEGY_SETTINGS = {
+    "full": {"tracking": False},
+    "pyramid": {"tracking": False, "pyramid_mode": True},
+    "tiles": {"tracking": False, "dirty_tiles": True},
+    "tracking": {"tracking": True},
+    "exact": {"tracking": False, "default_matcher": "exact"},
+    "anchors": {"tracking": False, "anchor_prefilter": True},
+    "multiscale": {"tracking": False, "multi_scale": True},
+    "channels": {"tracking": False, "color_mode": "channels"},
+    "histogram": {"tracking": False, "color_mode": "histogram"},
+    "autotune": {"tracking": False, "autotune": True}
+}
+
+
+def run_strategy(strategy, scene_args, template_paths, frames, threads=1, skip_unchanged=False):
+    # Без пропуска неизменных кадров каждый кадр сопоставляется и замер отражает
+    # стоимость поиска, а не детектора изменений
+    detection = dict(STRATEGY_SETTINGS[strategy], match_threads=threads, skip_unchanged_frames=skip_unchanged)
+    config = EngineConfig(image_paths=list(template_paths.values()), detection=detection)
+    engine = DetectionEngine(config)
+    engine.reset()
+    templates = {name: engine.template_cache.get(path) for name, path in template_paths.items()}
+    scene = SyntheticScene(**scene_args)
+    region = {"left": 0, "top": 0, "width": scene.width, "height": scene.height}
+    counts = [0, 0, 0]
+
+    try:
+        for index in range(frames):
+            bgra, truth = scene.next_frame()
+            started = time.perf_counter()
+            gray = cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY, dst=engine.buffers.gray(scene.height, scene.width))
+            engine.stats.add("convert", time.perf_counter() - started)
+            frame = Frame(region, gray, time.monotonic(), index, pooled=True)
+            frame.color = bgra
+            cycle = engine.process_frame(frame, config.image_paths)
+            if index == 0 and engine.autotuner is not None:
+                # Замер стратегий идёт в фоне по первому кадру; меряем уже настроенный поиск
+                engine.autotuner.join()
+            for (name, template), detections in zip(templates.items(), cycle.results):
+                for i, value in enumerate(score_detections(detections, truth[name], template)):
+                    counts[i] += value
+    finally:
+        engine.close()
+
+    # Генерация сцены и подсчёт метрик в скорость конвейера не входят
+    elapsed = sum(engine.stats.stage_seconds.values())
+    matched = engine.stats.matched
+    true_positives, false_positives, false_negatives = counts
+    return {
+        "strategy": strategy,
+        "frames": frames,
+        "skipped": engine.stats.skipped,
+        "matched": matched,
+        "match_ms_per_matched": engine.stats.stage_seconds.get("match", 0.0) * 1000 / matched if matched else 0.0,
+        "cycles_per_second": frames / elapsed if elapsed else 0.0,
+        "stage_ms": engine.stats.stage_ms(),
+        "precision": true_positives / (true_positives + false_positives) if true_positives + false_positives else 1.0,
+        "recall": true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 1.0
+    }
+
+
+def write_templates(directory, count, seed, transparent=False):
+    rng = np.random.default_rng(seed + 1000)
+    sprites = {}
+    paths = {}
+    for i in range(count):
+        size = int(rng.integers(32, 72))
+        name = f"template_{i}"
+        sprites[name] = make_sprite(rng, size, size, transparent)
+        paths[name] = os.path.join(directory, f"{name}.png")
+        cv2.imwrite(paths[name], sprites[name])
+    return sprites, paths
+
+
+def print_report(resolution, rows):
+    print(f"\n{resolution}")
+    # convert и change - в среднем на кадр, match - на сопоставленный кадр
+    print(f"{'strategy':<10} {'cycles/s':>9} {'convert':>9} {'change':>9} {'match':>9} "
+          f"{'matched':>8} {'precision':>10} {'recall':>8}")
+    for row in rows:
+        stages = row["stage_ms"]
+        print(f"{row['strategy']:<10} {row['cycles_per_second']:>9.1f} "
+              f"{stages.get('convert', 0):>7.2f}ms {stages.get('change', 0):>7.2f}ms "
+              f"{row['match_ms_per_matched']:>7.2f}ms {row['matched']:>8} "
+              f"{row['precision']:>10.3f} {row['recall']:>8.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic benchmark of the detection pipeline")
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument("--strategies", nargs="+", default=STRATEGIES, choices=STRATEGIES)
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--templates", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--noise", type=float, default=3.0)
+    parser.add_argument("--scale-jitter", type=float, default=0.03)
+    parser.add_argument("--display-scale", type=float, default=1.0, help="draw the targets scaled, like a high-DPI screen")
+    parser.add_argument("--lookalikes", type=int, default=0, help="grey copies of every target on screen")
+    parser.add_argument("--transparent", action="store_true", help="round targets with an alpha channel")
+    parser.add_argument("--skip-unchanged", action="store_true",
+                        help="skip frames the change detector sees as unchanged, like the live engine")
+    parser.add_argument("--threads", type=int, default=1, help="match pool size (0 = one per CPU)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    # Однопоточный OpenCV делает замеры сравнимыми между машинами
+    cv2.setNumThreads(1)
+    directory = tempfile.mkdtemp(prefix="autoclicker_bench_")
+    report = {}
+    try:
+        sprites, paths = write_templates(directory, args.templates, args.seed, args.transparent)
+        for resolution in args.resolutions:
+            width, height = RESOLUTIONS[resolution]
+            scene_args = {
+                "width": width, "height": height, "templates": sprites, "seed": args.seed,
+                "noise": args.noise, "scale_jitter": args.scale_jitter, "scale": args.display_scale,
+                "lookalikes": args.lookalikes
+            }
+            rows = [run_strategy(strategy, scene_args, paths, args.frames, args.threads, args.skip_unchanged)
+                    for strategy in args.strategies]
+            print_report(resolution, rows)
+            report[resolution] = rows
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
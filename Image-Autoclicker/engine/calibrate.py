@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import numpy as np
+import cv2
+from .config import EngineConfig
+from .template_cache import TemplateCache
+from .detection import MATCH_METHODS, correlate
+from .multiscale import scaled_templates
+from .capture import open_replay, CaptureExhausted, IMAGE_EXTENSIONS
+
+# Подбор порога и метода по записанным кадрам: в positive-кадрах шаблон есть,
+# в negative - нет (или там только похожие на него элементы)
+CALIBRATION_MARGIN = 0.02
+# Меньший зазор между positive и negative кадрами ненадёжен
+CALIBRATION_MIN_GAP = 0.1
+# Методы, отличающиеся по времени меньше чем на столько, считаются равными,
+# из них выбирается лучше разделяющий
+CALIBRATION_TIME_TOLERANCE = 1.1
+
+
+def to_gray(image):
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def read_frames(path):
+    # Кадр-картинка, папка кадров, видео или запись сессии .ring
+    if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise ValueError(f"Failed to read frame {path}")
+        return [to_gray(image)]
+    source = open_replay(path)
+    frames = []
+    try:
+        index = 0
+        while source.frame_count() is None or index < source.frame_count():
+            try:
+                # Кадры записи лежат в отображённом файле - копируем до его закрытия
+                frames.append(np.array(to_gray(source.read_frame(index))))
+            except CaptureExhausted:
+                break
+            index += 1
+    finally:
+        source.close()
+    return frames
+
+
+def best_scores(template, frames):
+    frames = [gray for gray in frames if template.width <= gray.shape[1] and template.height <= gray.shape[0]]
+    if frames:
+        # Первый вызов метода заметно дольше остальных, в замер он не входит
+        correlate(frames[0], template)
+    scores = []
+    started = time.perf_counter()
+    for gray in frames:
+        scores.append(cv2.minMaxLoc(correlate(gray, template))[1])
+    return scores, time.perf_counter() - started
+
+
+def safe_threshold(lowest_positive, highest_negative):
+    # Самый высокий порог, который ещё пропускает все positive-кадры
+    if highest_negative is not None and lowest_positive - highest_negative < CALIBRATION_MIN_GAP:
+        return None
+    return round(lowest_positive - CALIBRATION_MARGIN, 3)
+
+
+def calibrate_template(template, positives, negatives, scales):
+    variants = scaled_templates(template, scales)
+    # Без negative-кадров безопасность дешёвых методов не проверить
+    methods = list(MATCH_METHODS) if negatives else ["ccoeff"]
+    candidates = []
+    for scale, variant in variants.items():
+        for method in methods:
+            positive, seconds = best_scores(variant.with_method(method), positives)
+            if not positive:
+                continue
+            negative, negative_seconds = best_scores(variant.with_method(method), negatives)
+            frames = len(positives) + len(negatives)
+            highest_negative = max(negative) if negative else None
+            candidates.append({
+                "scale": scale,
+                "method": method,
+                "lowest_positive": min(positive),
+                "mean_positive": sum(positive) / len(positive),
+                "highest_negative": highest_negative,
+                "threshold": safe_threshold(min(positive), highest_negative),
+                "ms": 1000 * (seconds + negative_seconds) / frames
+            })
+    if not candidates:
+        return None, candidates
+
+    # Масштаб - тот, в котором шаблон лучше всего совпадает с positive-кадрами;
+    # баллы разных методов несравнимы, поэтому судим по ccoeff
+    reference = [c for c in candidates if c["method"] == "ccoeff"] or candidates
+    scale = max(reference, key=lambda c: c["mean_positive"])["scale"]
+    at_scale = [c for c in candidates if c["scale"] == scale]
+    safe = [c for c in at_scale if c["threshold"] is not None]
+    if not safe:
+        return None, candidates
+
+    def gap(candidate):
+        if candidate["highest_negative"] is None:
+            return candidate["lowest_positive"]
+        return candidate["lowest_positive"] - candidate["highest_negative"]
+
+    fastest = min(c["ms"] for c in safe)
+    cheap = [c for c in safe if c["ms"] <= fastest * CALIBRATION_TIME_TOLERANCE]
+    return max(cheap, key=gap), candidates
+
+
+def parse_frames(value):
+    # [IMAGE=]PATH: без IMAGE кадры относятся ко всем шаблонам
+    image, sep, path = value.partition("=")
+    if not sep or os.path.exists(value):
+        return None, value
+    return image, path
+
+
+def frames_for(selection, image):
+    paths = []
+    for target, path in selection:
+        if target is None or target in (image, os.path.basename(image)):
+            paths.append(path)
+    frames = []
+    for path in paths:
+        frames += read_frames(path)
+    return frames
+
+
+def print_report(image, chosen, candidates):
+    print(f"\n{image}")
+    print(f"{'scale':>6} {'method':<7} {'positive':>9} {'negative':>9} {'threshold':>10} {'ms':>8}")
+    for c in candidates:
+        negative = f"{c['highest_negative']:.3f}" if c["highest_negative"] is not None else "-"
+        threshold = f"{c['threshold']:.3f}" if c["threshold"] is not None else "unsafe"
+        mark = " *" if c is chosen else ""
+        print(f"{c['scale']:>6.2f} {c['method']:<7} {c['lowest_positive']:>9.3f} {negative:>9} "
+              f"{threshold:>10} {c['ms']:>8.2f}{mark}")
+    if chosen is None:
+        print("no method separates the positive and negative frames")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m engine.calibrate",
+                                     description="Pick a threshold, method and scale for every template "
+                                                 "from recorded positive and negative frames")
+    parser.add_argument("images", nargs="*", help="template images (default: image_paths from settings)")
+    parser.add_argument("--settings", help="settings.json of the desktop app")
+    parser.add_argument("--positive", type=parse_frames, action="append", default=[],
+                        help="frames showing the templates: [IMAGE=]PATH of an image, a directory, "
+                             "a video or a .ring recording, can be repeated")
+    parser.add_argument("--negative", type=parse_frames, action="append", default=[],
+                        help="frames without the templates, same format as --positive")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0], help="template scales to try")
+    parser.add_argument("--write", action="store_true", help="store the results in template_options of --settings")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+
+    settings = {}
+    if args.settings:
+        with open(args.settings, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+    images = args.images or EngineConfig.from_settings(settings).image_paths
+    if not images or not args.positive:
+        logging.error("Templates and positive frames are required")
+        return 1
+    if args.write and not args.settings:
+        logging.error("--write needs --settings")
+        return 1
+
+    cv2.setNumThreads(1)
+    cache = TemplateCache()
+    results = {}
+    for image in images:
+        template = cache.get(image)
+        positives = frames_for(args.positive, image)
+        if template is None or not positives:
+            logging.warning(f"Skipping {image}: no template or no positive frames")
+            continue
+        negatives = frames_for(args.negative, image)
+        if not negatives:
+            logging.warning(f"No negative frames for {image}: only the threshold is calibrated")
+        chosen, candidates = calibrate_template(template, positives, negatives, args.scales)
+        print_report(image, chosen, candidates)
+        if chosen is not None:
+            results[image] = {"threshold": chosen["threshold"], "method": chosen["method"]}
+            if len(args.scales) > 1:
+                results[image]["scale"] = chosen["scale"]
+
+    if args.write and results:
+        options = settings.setdefault("template_options", {})
+        for image, values in results.items():
+            options.setdefault(image, {}).update(values)
+        with open(args.settings, "w", encoding="utf-8") as f:
+            json.dump(settings, f, indent=4)
+        logging.info(f"Calibration of {len(results)} template(s) written to {args.settings}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import os
+import time
+import bisect
+import logging
+import cv2
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+class CaptureExhausted(Exception):
+    pass
+
+
+class VirtualClock:
+    # Для воспроизведения: сон мгновенно сдвигает время, а не ждёт
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+
+
+class CaptureBackend:
+    # Координаты регионов - абсолютные, как у mss: monitors[0] - весь рабочий стол
+    clock = staticmethod(time.monotonic)
+    sleep = staticmethod(time.sleep)
+
+    @property
+    def monitors(self):
+        raise NotImplementedError
+
+    def grab(self, region):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MssCapture(CaptureBackend):
+    def __init__(self):
+        import mss
+        self._sct = mss.mss()
+
+    @property
+    def monitors(self):
+        return self._sct.monitors
+
+    def grab(self, region):
+        return self._sct.grab(region)
+
+    def close(self):
+        self._sct.close()
+
+
+class FrameSourceCapture(CaptureBackend):
+    # Общая часть воспроизведения: кадр выбирается по виртуальному времени
+    def __init__(self, fps=10.0, loop=False):
+        self.fps = fps
+        self.loop = loop
+        self.virtual_clock = VirtualClock()
+        self.clock = self.virtual_clock.time
+        self.sleep = self.virtual_clock.sleep
+        self.frame_index = -1
+        self._frame = None
+
+    @property
+    def monitors(self):
+        height, width = self._current().shape[:2]
+        monitor = {"left": 0, "top": 0, "width": width, "height": height}
+        return [dict(monitor), dict(monitor)]
+
+    def grab(self, region):
+        index = int(self.clock() * self.fps)
+        frame = self._current(index)
+        left, top = region["left"], region["top"]
+        return frame[top:top + region["height"], left:left + region["width"]]
+
+    def _current(self, index=None):
+        if index is None:
+            index = max(0, self.frame_index)
+        if index != self.frame_index or self._frame is None:
+            count = self.frame_count()
+            if count is not None and index >= count:
+                if not self.loop or count == 0:
+                    raise CaptureExhausted(f"Replay finished after {count} frames")
+                index %= count
+            self._frame = _to_bgra(self.read_frame(index))
+            self.frame_index = index
+        return self._frame
+
+    def frame_count(self):
+        return None
+
+    def read_frame(self, index):
+        raise NotImplementedError
+
+
+class DirectoryReplayCapture(FrameSourceCapture):
+    def __init__(self, directory, fps=10.0, loop=False):
+        super().__init__(fps, loop)
+        self.paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.paths:
+            raise ValueError(f"No frames found in {directory}")
+        logging.info(f"Replaying {len(self.paths)} frames from {directory} at {fps} fps")
+
+    def frame_count(self):
+        return len(self.paths)
+
+    def read_frame(self, index):
+        frame = cv2.imread(self.paths[index], cv2.IMREAD_UNCHANGED)
+        if frame is None:
+            raise ValueError(f"Failed to read frame {self.paths[index]}")
+        return frame
+
+
+class VideoReplayCapture(FrameSourceCapture):
+    def __init__(self, path, fps=None, loop=False):
+        self.path = path
+        self._video = cv2.VideoCapture(path)
+        if not self._video.isOpened():
+            raise ValueError(f"Failed to open video {path}")
+        self._count = int(self._video.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+        self._position = 0
+        super().__init__(fps or self._video.get(cv2.CAP_PROP_FPS) or 10.0, loop)
+        logging.info(f"Replaying video {path} at {self.fps} fps")
+
+    def frame_count(self):
+        return self._count
+
+    def read_frame(self, index):
+        # Видео читается только вперёд; при зацикливании открываем заново
+        if index < self._position:
+            self._video.release()
+            self._video = cv2.VideoCapture(self.path)
+            self._position = 0
+        while self._position < index:
+            self._video.grab()
+            self._position += 1
+        ok, frame = self._video.read()
+        if not ok:
+            self._count = index
+            raise CaptureExhausted(f"Replay finished after {index} frames")
+        self._position += 1
+        return frame
+
+    def close(self):
+        self._video.release()
+
+
+class SyntheticCapture(FrameSourceCapture):
+    def __init__(self, scene, fps=10.0, frames=None):
+        super().__init__(fps, loop=False)
+        self.scene = scene
+        self.frames = frames
+        self.ground_truth = {}
+
+    def frame_count(self):
+        return self.frames
+
+    def read_frame(self, index):
+        # Сцена генерируется последовательно, пропущенные кадры всё равно проходим
+        frame = None
+        while self.scene.step <= index:
+            frame, self.ground_truth = self.scene.next_frame()
+        if frame is None:
+            frame = self._frame
+        return frame
+
+
+class RingReplayCapture(FrameSourceCapture):
+    # Запись сессии: кадры выбираются по сохранённым меткам времени
+    def __init__(self, path, loop=False):
+        from .recorder import RingReader
+        super().__init__(10.0, loop)
+        self.reader = RingReader(path)
+        self.frames = list(self.reader)
+        if not self.frames:
+            self.reader.close()
+            raise ValueError(f"No frames found in {path}")
+        self.timestamps = [frame.timestamp - self.frames[0].timestamp for frame in self.frames]
+        self.origin = self.frames[0].region
+        logging.info(f"Replaying {len(self.frames)} recorded frames from {path}")
+
+    @property
+    def monitors(self):
+        height, width = self.frames[0].gray.shape
+        monitor = {"left": self.origin["left"], "top": self.origin["top"], "width": width, "height": height}
+        return [dict(monitor), dict(monitor)]
+
+    def grab(self, region):
+        now = self.clock()
+        duration = self.timestamps[-1] + 1.0 / self.fps
+        if now >= duration:
+            if not self.loop:
+                raise CaptureExhausted(f"Replay finished after {len(self.frames)} frames")
+            now %= duration
+        index = bisect.bisect_right(self.timestamps, now) - 1
+        frame = self._current(max(0, index))
+        left, top = region["left"] - self.origin["left"], region["top"] - self.origin["top"]
+        return frame[top:top + region["height"], left:left + region["width"]]
+
+    def frame_count(self):
+        return len(self.frames)
+
+    def read_frame(self, index):
+        return self.frames[index].gray
+
+    def close(self):
+        self.frames = []
+        self._frame = None
+        self.reader.close()
+
+
+def open_replay(path, fps=None, loop=False):
+    if os.path.isdir(path):
+        return DirectoryReplayCapture(path, fps or 10.0, loop)
+    if path.lower().endswith(".ring"):
+        return RingReplayCapture(path, loop)
+    return VideoReplayCapture(path, fps, loop)
+
+
+def _to_bgra(frame):
+    # Серые кадры остаются одноканальными: цвета в них нет
+    if frame.ndim == 2:
+        return frame
+    if frame.shape[2] == 3:
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+    return frame
@@ -0,0 +1,49 @@
+import cv2
+
+THUMBNAIL_SCALE = 8
+
+
+def frame_thumbnail(frame):
+    def factory(frame):
+        width = max(1, frame.width // THUMBNAIL_SCALE)
+        height = max(1, frame.height // THUMBNAIL_SCALE)
+        return cv2.resize(frame.gray, (width, height), interpolation=cv2.INTER_AREA)
+    return frame.derived("thumbnail", factory)
+
+
+class ChangeDetector:
+    def __init__(self, threshold=8, refresh_every=50):
+        self.threshold = threshold
+        self.refresh_every = refresh_every
+        self.checked = 0
+        self.skipped = 0
+        self._previous = None
+        self._region = None
+        self._unchanged_run = 0
+
+    def changed(self, frame):
+        # Сравниваем с кадром, по которому было последнее сопоставление,
+        # чтобы медленные изменения не терялись между соседними кадрами
+        self.checked += 1
+        thumbnail = frame_thumbnail(frame)
+        if self._is_unchanged(frame, thumbnail):
+            self._unchanged_run += 1
+            self.skipped += 1
+            return False
+        self._previous = thumbnail
+        self._region = frame.region
+        self._unchanged_run = 0
+        return True
+
+    def _is_unchanged(self, frame, thumbnail):
+        if self._previous is None or self._region != frame.region or self._previous.shape != thumbnail.shape:
+            return False
+        if self.refresh_every > 0 and self._unchanged_run >= self.refresh_every:
+            return False
+        _, max_diff, _, _ = cv2.minMaxLoc(cv2.absdiff(self._previous, thumbnail))
+        return max_diff <= self.threshold
+
+    def reset(self):
+        self._previous = None
+        self._region = None
+        self._unchanged_run = 0
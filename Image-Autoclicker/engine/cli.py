@@ -0,0 +1,148 @@
+import json
+import logging
+import argparse
+import cv2
+from .config import EngineConfig, resolve_template_regions
+from .core import DetectionEngine
+from .capture import open_replay, SyntheticCapture
+from .synthetic import SyntheticScene
+
+
+def parse_area(value):
+    parts = [int(part) for part in value.split(",")]
+    if len(parts) not in (4, 5):
+        raise argparse.ArgumentTypeError("area must be LEFT,TOP,WIDTH,HEIGHT[,MONITOR]")
+    area = {"left": parts[0], "top": parts[1], "width": parts[2], "height": parts[3], "monitor_idx": 1}
+    if len(parts) == 5:
+        area["monitor_idx"] = parts[4]
+    return area
+
+
+def parse_size(value):
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("size must be WIDTHxHEIGHT")
+    return width, height
+
+
+def parse_named_area(value):
+    name, _, area = value.partition("=")
+    if not name or not area:
+        raise argparse.ArgumentTypeError("region must be NAME=LEFT,TOP,WIDTH,HEIGHT[,MONITOR]")
+    return dict(parse_area(area), name=name)
+
+
+def parse_binding(value):
+    image, _, names = value.partition("=")
+    if not image or not names:
+        raise argparse.ArgumentTypeError("binding must be IMAGE=REGION[,REGION]")
+    return image, names.split(",")
+
+
+def parse_monitors(value):
+    if value == "all":
+        return value
+    try:
+        return [int(part) for part in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("monitors must be 'all' or a list like 1,2,3")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m engine", description="Headless image autoclicker engine")
+    parser.add_argument("images", nargs="*", help="template images (default: image_paths from settings)")
+    parser.add_argument("--settings", help="settings.json of the desktop app")
+    parser.add_argument("--area", type=parse_area, help="search area LEFT,TOP,WIDTH,HEIGHT[,MONITOR]")
+    parser.add_argument("--region", type=parse_named_area, action="append", default=[],
+                        help="named search region NAME=LEFT,TOP,WIDTH,HEIGHT[,MONITOR], can be repeated")
+    parser.add_argument("--bind", type=parse_binding, action="append", default=[],
+                        help="search IMAGE only in the given regions: IMAGE=REGION[,REGION], can be repeated")
+    parser.add_argument("--monitors", type=parse_monitors, help="search these monitors at once: 'all' or 1,2,3")
+    parser.add_argument("--sequence", action="store_true", help="search the images one after another")
+    parser.add_argument("--cycles", type=int, default=0, help="stop after this many cycles (0 = run until Ctrl+C)")
+    parser.add_argument("--dry-run", action="store_true", help="log clicks instead of performing them")
+    parser.add_argument("--replay", help="directory of recorded frames, a video or a .ring session recording "
+                                         "to use instead of the screen")
+    parser.add_argument("--replay-fps", type=float, help="frame rate of the recording (default: 10 or the video's)")
+    parser.add_argument("--loop", action="store_true", help="restart the replay when it ends")
+    parser.add_argument("--synthetic", type=parse_size, help="generate WIDTHxHEIGHT frames with the templates planted")
+    parser.add_argument("--synthetic-frames", type=int, default=100)
+    parser.add_argument("--record", help="record captured frames and detections to this ring file")
+    parser.add_argument("--record-size-mb", type=int, help="size of the ring file (default: from settings)")
+    parser.add_argument("--verbose", action="store_true")
+    return parser
+
+
+def load_config(args):
+    settings = {}
+    if args.settings:
+        with open(args.settings, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+    config = EngineConfig.from_settings(settings, image_paths=args.images or None)
+    if args.area:
+        config.search_area = args.area
+    if args.region:
+        config.search_regions = args.region
+    if args.bind:
+        config.template_regions.update(resolve_template_regions({"template_regions": dict(args.bind)},
+                                                                config.image_paths))
+    if args.monitors:
+        config.detection["search_monitors"] = args.monitors
+    if args.sequence:
+        config.sequence_mode = True
+    if args.dry_run:
+        config.delay_between_clicks = 0
+    if args.record:
+        config.detection["record_session"] = True
+        config.detection["record_path"] = args.record
+    if args.record_size_mb:
+        config.detection["record_size_mb"] = args.record_size_mb
+    return config
+
+
+def open_capture(args, config):
+    if args.replay:
+        return open_replay(args.replay, args.replay_fps, args.loop)
+    if args.synthetic:
+        width, height = args.synthetic
+        sprites = {}
+        for path in config.image_paths:
+            sprite = cv2.imread(path, cv2.IMREAD_COLOR)
+            if sprite is not None:
+                sprites[path] = sprite
+        return SyntheticCapture(SyntheticScene(width, height, sprites), frames=args.synthetic_frames)
+    return None
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+    config = load_config(args)
+    if not config.image_paths:
+        logging.error("No template images given")
+        return 1
+
+    screen = open_capture(args, config)
+    engine = DetectionEngine(config, screen=screen)
+    # Записанные кадры не связаны с текущим экраном - кликать по ним нельзя
+    if args.dry_run or screen is not None:
+        engine.click = lambda x, y: logging.info(f"Dry run: click at ({x}, {y}) skipped")
+
+    def on_cycle(cycle):
+        if cycle.matched:
+            logging.info(f"Cycle {engine.stats.cycles}: {len(cycle.positions)} detection(s) {cycle.positions}")
+        if args.cycles and engine.stats.cycles >= args.cycles:
+            engine.stop()
+
+    engine.on_cycle = on_cycle
+    engine.running = True
+    try:
+        engine.run()
+    except KeyboardInterrupt:
+        engine.stop()
+    finally:
+        if screen is not None:
+            screen.close()
+    return 0
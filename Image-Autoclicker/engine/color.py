@@ -0,0 +1,76 @@
+import logging
+import numpy as np
+import cv2
+from .detection import Detections, result_to_detections
+
+# Цветовые режимы шаблона: "gray" - поиск по яркости, "channels" - корреляция
+# по выбранным каналам, "histogram" - серый поиск и проверка цвета находок
+COLOR_MODES = ("gray", "channels", "histogram")
+CHANNEL_INDEX = {"b": 0, "g": 1, "r": 2}
+# Оттенок и насыщенность: у серых пикселей оттенок случаен, их отделяет насыщенность
+HISTOGRAM_BINS = [18, 8]
+HISTOGRAM_RANGES = [0, 180, 0, 256]
+
+
+def channel_weights(channels):
+    # "rg" или {"r": 2, "g": 1}; веса нормируются к наибольшему
+    if isinstance(channels, str):
+        channels = {name: 1.0 for name in channels.lower()}
+    weights = [0.0, 0.0, 0.0]
+    for name, weight in channels.items():
+        if name in CHANNEL_INDEX:
+            weights[CHANNEL_INDEX[name]] = float(weight)
+    top = max(weights)
+    if top <= 0:
+        return None
+    return tuple(weight / top for weight in weights)
+
+
+def select_channels(image, weights):
+    # image - BGR или BGRA; без весов каналы остаются 8-битными
+    parts = [(cv2.extractChannel(image, index), weight) for index, weight in enumerate(weights) if weight > 0]
+    if any(weight != 1.0 for _, weight in parts):
+        parts = [(part.astype(np.float32) * weight, weight) for part, weight in parts]
+    if len(parts) == 1:
+        return parts[0][0]
+    return cv2.merge([part for part, _ in parts])
+
+
+def match_template_channels(frame, template, weights, threshold, max_detections):
+    if template.width > frame.width or template.height > frame.height:
+        logging.warning(f"Template {template.path} is larger than search region {frame.width}x{frame.height}")
+        return Detections()
+    image = frame.derived(("channels", weights), lambda frame: select_channels(frame.color, weights))
+    template_image = template.derived(("channels", weights),
+                                      lambda template: select_channels(template.color, weights))
+    # Среднее вычитается по каждому каналу, балл - общий по всем выбранным
+    result = cv2.matchTemplate(image, template_image, cv2.TM_CCOEFF_NORMED, mask=template.mask)
+    if template.mask is not None:
+        cv2.patchNaNs(result, 0.0)
+    return result_to_detections(result, template, threshold, max_detections)
+
+
+def color_histogram(image, mask=None):
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    histogram = cv2.calcHist([hsv], [0, 1], mask, HISTOGRAM_BINS, HISTOGRAM_RANGES)
+    return cv2.normalize(histogram, histogram, 1.0, 0.0, cv2.NORM_L1)
+
+
+def histogram_gate(frame, template, detections, min_similarity):
+    # Дешёвая проверка цвета только в местах, найденных серым поиском:
+    # пересечение нормированных гистограмм, 1.0 - тот же набор цветов
+    expected = template.derived("histogram", lambda template: color_histogram(template.color, template.mask))
+    kept = Detections(best_score=detections.best_score)
+    for detection in detections:
+        x0 = detection.x - template.width // 2
+        y0 = detection.y - template.height // 2
+        window = frame.color[y0:y0 + template.height, x0:x0 + template.width]
+        if window.shape[:2] != (template.height, template.width):
+            continue
+        similarity = cv2.compareHist(expected, color_histogram(cv2.cvtColor(window, cv2.COLOR_BGRA2BGR),
+                                                               template.mask), cv2.HISTCMP_INTERSECT)
+        if similarity >= min_similarity:
+            kept.append(detection)
+        else:
+            logging.debug(f"Colour of {template.path} at ({detection.x}, {detection.y}) differs: {similarity:.2f}")
+    return kept
@@ -0,0 +1,49 @@
+import threading
+
+
+class EarlyExit:
+    # Условие клика проверяется по ходу сопоставления: как только исход известен,
+    # оставшиеся шаблоны цикла не ищутся. Общий для всех мониторов и областей цикла.
+    # Клик идёт по первому найденному шаблону списка, поэтому пропускаются только
+    # шаблоны после него - шаблоны раньше по списку ещё могут стать целью клика
+    def __init__(self, conditions, images):
+        self.click_if_not_found = conditions["click_if_not_found"]
+        # min_images = 0 кликает всегда, но по найденной позиции, поэтому ищем хотя бы одну
+        self.needed = max(1, conditions["min_images"])
+        self.found = 0
+        # Сколько шаблонов искать одновременно: столько находок нужно для решения
+        self.window = 1 if self.click_if_not_found else self.needed
+        self._index = {path: index for index, path in reversed(list(enumerate(images)))}
+        self._first = None
+        self._lock = threading.Lock()
+
+    def add(self, path, detections):
+        with self._lock:
+            self.found += len(detections)
+            if detections and (self._first is None or self._index[path] < self._first):
+                self._first = self._index[path]
+
+    def skip(self, path):
+        with self._lock:
+            # click_if_not_found: любая находка отменяет клик
+            if self.click_if_not_found:
+                return self.found > 0
+            return self.found >= self.needed and self._index[path] > self._first
+
+
+class HitRates:
+    # Доля циклов, в которых шаблон находился; частые находки ищутся первыми
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self._rates = {}
+        self._lock = threading.Lock()
+
+    def update(self, path, found):
+        with self._lock:
+            rate = self._rates.get(path, 0.0)
+            self._rates[path] = rate + self.smoothing * ((1.0 if found else 0.0) - rate)
+
+    def order(self, images):
+        with self._lock:
+            rates = dict(self._rates)
+        return sorted(images, key=lambda path: -rates.get(path, 0.0))
@@ -0,0 +1,116 @@
+import os
+
+DEFAULT_DETECTION_SETTINGS = {
+    "pyramid_mode": False,
+    "pyramid_levels": 2,
+    "pyramid_candidates": 5,
+    "max_detections": 10,
+    "parallel_matching": True,
+    "match_threads": 0,
+    "tracking": True,
+    "tracking_padding": 32,
+    "tracking_full_search_every": 20,
+    "skip_unchanged_frames": True,
+    "change_threshold": 8,
+    "change_refresh_every": 50,
+    "dirty_tiles": False,
+    "tile_size": 256,
+    "poll_min_interval": 0.1,
+    "poll_max_interval": 0.5,
+    "poll_backoff": 1.5,
+    "poll_near_margin": 0.1,
+    "search_monitors": [],
+    "early_exit": True,
+    "default_matcher": "ncc",
+    "exact_tolerance": 12,
+    "anchor_prefilter": False,
+    "multi_scale": False,
+    "scales": [1.0, 0.8, 1.25, 1.5],
+    "scale_retry_after": 5,
+    "color_mode": "gray",
+    "color_channels": "bgr",
+    "color_threshold": 0.5,
+    "autotune": False,
+    "autotune_strategies": ["full", "pyramid", "anchors", "exact"],
+    "autotune_frames": 3,
+    "autotune_sample_every": 10,
+    "capture_prefetch": False,
+    "prefetch_max_age": 0.1,
+    "record_session": False,
+    "record_path": "",
+    "record_size_mb": 256
+}
+
+DEFAULT_CLICK_CONDITIONS = {
+    "min_images": 1,
+    "click_if_not_found": False,
+    "max_clicks": 0
+}
+
+MATCH_THRESHOLD = 0.7
+
+
+def resolve_per_template(settings, key, image_paths):
+    # Настройки шаблонов задаются по исходному пути или имени файла, а движок
+    # получает пути временных копий в том же порядке
+    values = settings.get(key) or {}
+    originals = settings.get("image_paths", [])
+    resolved = {}
+    for i, path in enumerate(image_paths):
+        keys = [path, os.path.basename(path)]
+        if len(originals) == len(image_paths):
+            keys += [originals[i], os.path.basename(originals[i])]
+        for name in keys:
+            if name in values:
+                resolved[path] = values[name]
+                break
+    return resolved
+
+
+def resolve_template_regions(settings, image_paths):
+    resolved = resolve_per_template(settings, "template_regions", image_paths)
+    return {path: [names] if isinstance(names, str) else list(names) for path, names in resolved.items()}
+
+
+class EngineConfig:
+    def __init__(self, image_paths=(), search_area=None, click_conditions=None, sequence_mode=False,
+                 clicks_per_cycle=3, delay_between_clicks=0.2, delay_after_disappearance=10.0,
+                 detection=None, search_regions=None, template_regions=None, template_options=None):
+        self.image_paths = list(image_paths)
+        self.search_area = search_area
+        # Именованные области {"name", "left", "top", "width", "height", "monitor_idx"}
+        # и привязка шаблонов к ним: путь шаблона -> [имена областей]
+        self.search_regions = list(search_regions or [])
+        self.template_regions = dict(template_regions or {})
+        # Настройки отдельных шаблонов: путь шаблона -> {"matcher": ..., ...}
+        self.template_options = dict(template_options or {})
+        self.click_conditions = dict(DEFAULT_CLICK_CONDITIONS)
+        self.click_conditions.update(click_conditions or {})
+        self.sequence_mode = sequence_mode
+        self.clicks_per_cycle = clicks_per_cycle
+        self.delay_between_clicks = delay_between_clicks
+        self.delay_after_disappearance = delay_after_disappearance
+        self.detection = dict(DEFAULT_DETECTION_SETTINGS)
+        self.detection.update(detection or {})
+
+    def template_option(self, path, name, default=None):
+        return self.template_options.get(path, {}).get(name, default)
+
+    @classmethod
+    def from_settings(cls, settings, image_paths=None):
+        # Пути из settings.json - оригиналы; приложение передаёт свои временные копии
+        if image_paths is None:
+            image_paths = settings.get("image_paths", [])
+        return cls(
+            image_paths=image_paths,
+            search_area=settings.get("search_area"),
+            click_conditions=settings.get("click_conditions"),
+            sequence_mode=settings.get("sequence_mode", False),
+            clicks_per_cycle=int(settings.get("clicks_per_cycle", 3)),
+            delay_between_clicks=settings.get("delay_between_clicks", 0.2),
+            delay_after_disappearance=settings.get("delay_after_disappearance", 10.0),
+            detection=settings.get("detection"),
+            search_regions=settings.get("search_regions"),
+            template_regions=resolve_template_regions(settings, image_paths),
+            template_options=resolve_per_template(settings, "template_options", image_paths)
+        )
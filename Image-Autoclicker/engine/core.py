@@ -0,0 +1,625 @@
+import os
+import time
+import tempfile
+import threading
+import logging
+from .config import MATCH_THRESHOLD
+from .template_cache import TemplateCache
+from .detection import capture_frame, match_template, match_template_pyramid, match_template_windows, MatchPool, Detections
+from .exact_matching import match_exact
+from .anchors import match_template_anchored
+from .color import channel_weights, match_template_channels, histogram_gate
+from .autotune import Autotuner, match_with
+from .multiscale import ScaleSelector, scaled_templates
+from .lanes import SearchLane, MAIN_LANE, REGIONS_LANE, area_to_region, union_region
+from .monitors import MonitorWorkers, select_monitors
+from .conditions import EarlyExit, HitRates
+from .scheduler import PollScheduler
+from .capture import MssCapture, CaptureExhausted
+from .recorder import SessionRecorder, read_recent
+from .prefetch import CapturePrefetcher
+
+
+class CycleResult:
+    def __init__(self, frame, images, results, matched):
+        self.frame = frame
+        self.images = images
+        self.results = results
+        self.matched = matched
+        # points - экранные точки находок по шаблонам в порядке images, positions - все подряд
+        self.points = []
+        self.positions = []
+        self.clicked = False
+        self.lane = None
+        self.parts = [self]
+
+
+def merge_cycles(parts, images):
+    # Итог по нескольким мониторам и областям: координаты в results относятся
+    # к кадрам частей, positions уже глобальные
+    results = []
+    for path in images:
+        found = [part.results[part.images.index(path)] for part in parts if path in part.images]
+        scores = [detections.best_score for detections in found if detections.best_score is not None]
+        results.append(Detections((d for detections in found for d in detections), max(scores, default=None)))
+    cycle = CycleResult(parts[0].frame, images, results, any(part.matched for part in parts))
+    # Клик идёт по первому найденному шаблону списка, на каком бы мониторе он ни был
+    cycle.points = [[point for part in parts if path in part.images for point in part.points[part.images.index(path)]]
+                    for path in images]
+    cycle.positions = [point for points in cycle.points for point in points]
+    cycle.parts = parts
+    return cycle
+
+
+class EngineStats:
+    def __init__(self):
+        self.cycles = 0
+        self.matched = 0
+        self.skipped = 0
+        self.early_exits = 0
+        self.clicks = 0
+        self.stage_seconds = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def count(self, field):
+        # Мониторы обрабатываются в своих потоках
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def stage_ms(self):
+        if not self.cycles:
+            return {}
+        return {stage: total * 1000 / self.cycles for stage, total in self.stage_seconds.items()}
+
+    def summary(self):
+        stages = ", ".join(f"{stage} {ms:.2f}ms" for stage, ms in self.stage_ms().items())
+        return (f"{self.cycles} cycles, {self.skipped} skipped as unchanged, "
+                f"{self.early_exits} decided early, {self.clicks} clicks"
+                + (f"; per cycle: {stages}" if stages else ""))
+
+
+def find_default_monitor(monitors):
+    # Основной монитор - ближайший к началу координат
+    default_monitor = None
+    min_distance = float('inf')
+    for monitor in monitors[1:]:
+        distance = (monitor["left"] ** 2 + monitor["top"] ** 2) ** 0.5
+        if distance < min_distance:
+            min_distance = distance
+            default_monitor = monitor
+    return default_monitor
+
+
+def pyautogui_click(x, y):
+    import pyautogui
+    pyautogui.FAILSAFE = True
+    pyautogui.PAUSE = 0.01
+    pyautogui.click(x, y)
+
+
+class DetectionEngine:
+    def __init__(self, config, template_cache=None, screen=None, click=None,
+                 on_click=None, on_stop=None, on_cycle=None):
+        self.config = config
+        self.template_cache = template_cache if template_cache is not None else TemplateCache()
+        self.screen = screen
+        self.click = click or pyautogui_click
+        self.on_click = on_click
+        self.on_stop = on_stop
+        self.on_cycle = on_cycle
+        self.running = False
+        self.total_clicks = 0
+        self.image_index = 0
+        self.last_frame = None
+        self.stats = EngineStats()
+        self.hit_rates = HitRates()
+        self.scale_selector = None
+        self.match_pool = None
+        self.lanes = {}
+        self.scheduler = None
+        self.recorder = None
+        self.prefetcher = None
+        self.monitor_workers = None
+        self.autotuner = None
+        self.buffers = None
+        self._thread = None
+
+    def update_config(self, config):
+        # Подхватывается со следующего цикла
+        self.config = config
+
+    def is_running(self):
+        return self.running
+
+    @property
+    def clock(self):
+        return getattr(self.screen, "clock", time.monotonic)
+
+    def start(self):
+        if self.running:
+            return self._thread
+        self.running = True
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self.running = False
+
+    def reset(self):
+        self.close()
+        detection = self.config.detection
+        workers = detection["match_threads"] if detection["parallel_matching"] else 1
+        self.match_pool = MatchPool(workers)
+        self.lanes = {}
+        # Источник кадров задаёт часы: при воспроизведении время виртуальное
+        self.scheduler = PollScheduler(detection["poll_min_interval"], detection["poll_max_interval"],
+                                       detection["poll_backoff"], detection["poll_near_margin"],
+                                       clock=self.clock, sleep=getattr(self.screen, "sleep", time.sleep))
+        record_path = detection["record_path"] or os.path.join(tempfile.gettempdir(), "autoclicker_session.ring")
+        self.autotuner = None
+        if detection["autotune"]:
+            self.autotuner = Autotuner(detection["autotune_strategies"], detection["autotune_frames"],
+                                       detection["autotune_sample_every"])
+            # Пока своих кадров нет, пробуем на последних кадрах прошлой записи
+            if os.path.exists(record_path):
+                try:
+                    self.autotuner.seed(read_recent(record_path, detection["autotune_frames"]))
+                except Exception as e:
+                    logging.warning(f"Failed to read autotune frames from {record_path}: {e}")
+        if detection["record_session"]:
+            self.recorder = SessionRecorder(record_path, detection["record_size_mb"])
+        self.buffers = self.lane(MAIN_LANE).buffers
+        self.stats = EngineStats()
+        self.hit_rates = HitRates()
+        self.scale_selector = None
+        if detection["multi_scale"]:
+            self.scale_selector = ScaleSelector(detection["scales"], detection["scale_retry_after"])
+        self.image_index = 0
+
+    def lane(self, name, cropped=False):
+        lane = self.lanes.get(name)
+        if lane is None:
+            detection = self.config.detection
+            # С предвыборкой в работе три кадра: сопоставляемый, ждущий в слоте и снимаемый
+            depth = 3 if detection["capture_prefetch"] and name == MAIN_LANE else 2
+            lane = self.lanes[name] = SearchLane(name, detection, depth, cropped)
+        return lane
+
+    def close(self):
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            logging.info(f"Capture prefetch: {self.prefetcher.hits} frames ready in time, "
+                         f"{self.prefetcher.misses} waited for, {self.prefetcher.stale} discarded as stale")
+            self.prefetcher = None
+        if self.monitor_workers is not None:
+            self.monitor_workers.shutdown()
+            self.monitor_workers = None
+        if self.match_pool is not None:
+            self.match_pool.shutdown()
+            self.match_pool = None
+        for lane in self.lanes.values():
+            lane.close()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.autotuner is not None:
+            self.autotuner.close()
+            self.autotuner = None
+
+    def run(self):
+        # Флаг running ставит вызывающий (start() или синхронный запуск): stop(),
+        # пришедший до начала run(), не должен потеряться
+        owns_screen = self.screen is None
+        if owns_screen:
+            # mss привязан к потоку, поэтому создаётся в рабочем потоке
+            self.screen = MssCapture()
+        self.reset()
+        detection = self.config.detection
+        if detection["capture_prefetch"] and not detection["search_monitors"]:
+            if owns_screen:
+                self.prefetcher = CapturePrefetcher(MssCapture, self.buffers, self.clock)
+                self.scheduler.on_wait = self.prefetcher.schedule
+            else:
+                # Воспроизведение идёт по виртуальным часам, снимать заранее нечего
+                logging.info("Capture prefetch works only with the live screen, disabled")
+        if detection["search_monitors"]:
+            self.monitor_workers = MonitorWorkers(self.screen, MssCapture if owns_screen else None)
+        try:
+            monitor = find_default_monitor(self.screen.monitors)
+            if monitor is None:
+                logging.error("No monitors found. Stopping click process.")
+                self.stop()
+                return
+            logging.info(f"Screen size: {monitor['width']}x{monitor['height']}")
+            while self.running:
+                self.step(monitor)
+        finally:
+            self.close()
+            if owns_screen:
+                self.screen.close()
+                self.screen = None
+            self.running = False
+            logging.info(f"Detection stopped: {self.stats.summary()}")
+            tile_matchers = [lane.tile_matcher for lane in self.lanes.values() if lane.tile_matcher is not None]
+            if tile_matchers:
+                logging.info(f"Dirty tiles matched: {sum(t.tiles_matched for t in tile_matchers)}/"
+                             f"{sum(t.tiles_total for t in tile_matchers)}")
+            if self.on_stop:
+                self.on_stop()
+
+    def images_for_cycle(self, config):
+        if not config.image_paths:
+            return []
+        if config.sequence_mode:
+            if self.image_index >= len(config.image_paths):
+                self.image_index = 0
+            return [config.image_paths[self.image_index]]
+        return list(config.image_paths)
+
+    def search_region(self, config, default_monitor):
+        search_area = config.search_area
+        if search_area is not None and "monitor_idx" in search_area:
+            region = area_to_region(search_area, self.screen.monitors)
+            if region is not None:
+                logging.debug(f"Search area: {region}")
+                return region
+        region = {
+            "left": default_monitor["left"],
+            "top": default_monitor["top"],
+            "width": default_monitor["width"],
+            "height": default_monitor["height"]
+        }
+        logging.debug(f"Using default monitor: {region}")
+        return region
+
+    def search_targets(self, config, default_monitor, images):
+        # Цель цикла - один снимок: (ключ, область снимка, вырезки). Вырезка -
+        # (полоса, область, монитор для ограничения клика, шаблоны)
+        monitors = self.screen.monitors
+        bound = self.bound_regions(config, images, default_monitor)
+        unbound = [path for path in images if not bound.get(path)]
+        targets = []
+        if unbound:
+            selected = []
+            if config.search_area is None and self.monitor_workers is not None:
+                selected = select_monitors(monitors, config.detection["search_monitors"])
+            for index in selected:
+                region = {key: monitors[index][key] for key in ("left", "top", "width", "height")}
+                targets.append((index, region, [(index, region, monitors[index], unbound)]))
+            if not selected:
+                region = self.search_region(config, default_monitor)
+                bounds = default_monitor
+                search_area = config.search_area
+                if search_area is not None and "monitor_idx" in search_area and search_area["monitor_idx"] < len(monitors):
+                    bounds = monitors[search_area["monitor_idx"]]
+                targets.append((MAIN_LANE, region, [(MAIN_LANE, region, bounds, unbound)]))
+
+        # Именованные области снимаются одним кадром по их общей рамке
+        crops = {}
+        for path in images:
+            for name, region, bounds in bound.get(path, []):
+                if name not in crops:
+                    crops[name] = (f"region:{name}", region, bounds, [])
+                crops[name][3].append(path)
+        if crops:
+            union = union_region([crop[1] for crop in crops.values()])
+            targets.append((REGIONS_LANE, union, list(crops.values())))
+        return targets
+
+    def bound_regions(self, config, images, default_monitor):
+        # Шаблон -> [(имя, абсолютная область, монитор)] по привязке из настроек
+        if not config.search_regions or not config.template_regions:
+            return {}
+        monitors = self.screen.monitors
+        areas = {area["name"]: area for area in config.search_regions if "name" in area}
+        bound = {}
+        for path in images:
+            for name in config.template_regions.get(path, []):
+                area = areas.get(name)
+                region = area_to_region(area, monitors) if area is not None else None
+                if region is None:
+                    logging.warning(f"Search region '{name}' of {path} not found")
+                    continue
+                bound.setdefault(path, []).append((name, region, monitors[area.get("monitor_idx", 1)]))
+        return bound
+
+    def step(self, default_monitor):
+        config = self.config
+        images = self.images_for_cycle(config)
+        if not images:
+            self.scheduler.wait(self.is_running)
+            return None
+
+        targets = self.search_targets(config, default_monitor, images)
+        for _, region, _ in targets:
+            if region["width"] <= 0 or region["height"] <= 0:
+                logging.error(f"Invalid region size: {region}. Stopping click process.")
+                self.stop()
+                return None
+
+        early_exit = EarlyExit(config.click_conditions, images) if config.detection["early_exit"] else None
+        try:
+            if len(targets) == 1 or self.monitor_workers is None:
+                parts = [part for target in targets for part in self.scan(target, default_monitor, early_exit)]
+            else:
+                # Каждый монитор снимается и сопоставляется в своём потоке
+                by_key = {target[0]: target for target in targets}
+                scans = self.monitor_workers.map(lambda key: self.scan(by_key[key], default_monitor, early_exit),
+                                                 list(by_key))
+                parts = [part for scan in scans for part in scan]
+        except CaptureExhausted as e:
+            logging.info(f"Capture source exhausted: {e}")
+            self.stop()
+            return None
+        if not parts:
+            self.scheduler.wait(self.is_running)
+            return None
+        self.stats.cycles += 1
+        cycle = parts[0] if len(parts) == 1 else merge_cycles(parts, images)
+        self.last_frame = cycle.frame
+
+        if self.recorder is not None:
+            started = time.perf_counter()
+            try:
+                self.recorder.record_cycle(cycle)
+            except Exception as e:
+                logging.error(f"Error recording frame, recording disabled: {e}")
+                self.recorder.close()
+                self.recorder = None
+            self.stats.add("record", time.perf_counter() - started)
+
+        # Близкий к порогу балл считаем только по свежему сопоставлению;
+        # у шаблонов свои пороги, поэтому сравниваем запас до порога
+        best_margin = None
+        if cycle.matched:
+            best_margin = max((r.best_score - self.threshold_for(path, config)
+                               for path, r in zip(cycle.images, cycle.results) if r.best_score is not None),
+                              default=None)
+        frame_changed = any(self.lane(part.lane).change_detector is not None and self.lane(part.lane).frame_changed
+                            for part in cycle.parts)
+        self.scheduler.update(found=bool(cycle.positions), changed=frame_changed,
+                              best_score=best_margin, threshold=0.0)
+
+        if self.should_click(cycle.positions, config.click_conditions):
+            _, region, bounds, _ = targets[0][2][0]
+            cycle.clicked = self.actuate(cycle, config, region, default_monitor, bounds)
+        else:
+            self.scheduler.wait(self.is_running)
+        if self.on_cycle:
+            self.on_cycle(cycle)
+        return cycle
+
+    def scan(self, target, default_monitor, early_exit=None):
+        key, region, crops = target
+        # Один снимок области на цикл, общий для всех шаблонов и вырезок
+        started = time.perf_counter()
+        try:
+            frame = self.capture(region, self.lane(key))
+        except CaptureExhausted:
+            raise
+        except Exception as e:
+            logging.error(f"Error capturing region {region}: {e}")
+            return []
+        self.stats.add("capture", time.perf_counter() - started)
+
+        parts = []
+        for name, crop_region, bounds, images in crops:
+            crop = frame if crop_region == region else frame.crop(crop_region)
+            cycle = self.match_frame(crop, images, self.lane(name, cropped=name != key), early_exit)
+            cycle.points = [[self.to_click_point(crop, detection.x, detection.y, default_monitor, bounds)
+                             for detection in detections] for detections in cycle.results]
+            cycle.positions = [point for points in cycle.points for point in points]
+            parts.append(cycle)
+        return parts
+
+    def capture(self, region, lane):
+        if self.prefetcher is not None and lane.name == MAIN_LANE:
+            return self.prefetcher.take(region, self.config.detection["prefetch_max_age"])
+        screen = self.monitor_workers if self.monitor_workers is not None else self.screen
+        return capture_frame(screen, region, self.stats.cycles, self.clock, lane.buffers)
+
+    def process_frame(self, frame, images):
+        self.stats.cycles += 1
+        self.last_frame = frame
+        return self.match_frame(frame, images, self.lane(MAIN_LANE))
+
+    def match_frame(self, frame, images, lane, early_exit=None):
+        config = self.config
+        # Экран не изменился - используем результаты прошлого цикла
+        started = time.perf_counter()
+        search_key = (tuple(images), self.template_cache.version)
+        lane.frame_changed = lane.change_detector is None or lane.change_detector.changed(frame)
+        self.stats.add("change", time.perf_counter() - started)
+        matched = lane.frame_changed or search_key != lane.previous_key
+        if matched:
+            started = time.perf_counter()
+            if early_exit is None:
+                # Шаблоны сопоставляются параллельно, результаты идут в порядке списка
+                lane.results = self.match_pool.map(lambda path: self.find_in_frame(frame, path, config, lane), images)
+                complete = True
+            else:
+                lane.results, complete = self.match_until_decided(frame, images, lane, early_exit)
+            # Прерванный поиск не годится для повторного использования
+            lane.previous_key = (tuple(images), self.template_cache.version) if complete else None
+            self.stats.add("match", time.perf_counter() - started)
+            self.stats.count("matched")
+            # Кадр попадает в пробные после поиска, чтобы не мерить стратегии дважды на одном кадре
+            if self.autotuner is not None:
+                self.autotuner.observe(frame)
+        else:
+            self.stats.count("skipped")
+        cycle = CycleResult(frame, images, lane.results, matched)
+        cycle.lane = lane.name
+        return cycle
+
+    def match_until_decided(self, frame, images, lane, early_exit):
+        # Часто находимые шаблоны идут первыми, одновременно ищется не больше шаблонов,
+        # чем нужно находок для решения; следующий ставится в пул, только пока исход
+        # не ясен. Результаты возвращаются в порядке списка, пропущенные - пустые
+        config = self.config
+
+        def match(path):
+            detections = self.find_in_frame(frame, path, config, lane)
+            early_exit.add(path, detections)
+            self.hit_rates.update(path, bool(detections))
+            return detections
+
+        found = self.match_pool.map_while(match, self.hit_rates.order(images), early_exit.window,
+                                          lambda path: not early_exit.skip(path))
+        if len(found) < len(images):
+            self.stats.count("early_exits")
+        return [found.get(path, Detections()) for path in images], len(found) == len(images)
+
+    def find_in_frame(self, frame, img_path, config, lane=None):
+        lane = lane or self.lane(MAIN_LANE)
+        try:
+            template = self.template_cache.get(img_path)
+            if template is None:
+                return Detections()
+            scale = config.template_option(img_path, "scale")
+            selected = scale is None and self.scale_selector is not None
+            if scale is not None:
+                # Масштаб из настроек шаблона отменяет автоматический выбор
+                template = scaled_templates(template, [float(scale)])[float(scale)]
+            elif selected:
+                # Ищем в запомненном для этого монитора масштабе
+                template = self.scale_selector.template_for(frame, template, lane.name)
+            template = template.with_method(config.template_option(img_path, "method", "ccoeff"))
+            detections = self.match_in_frame(frame, template, config, lane)
+            if selected:
+                self.scale_selector.update(lane.name, img_path, bool(detections))
+            return detections
+        except Exception as e:
+            logging.error(f"Error processing image {img_path}: {e}")
+            return Detections()
+
+    def match_in_frame(self, frame, template, config, lane):
+        img_path = template.path
+        detection = config.detection
+        threshold = self.threshold_for(img_path, config)
+        max_detections = detection["max_detections"]
+        color = self.color_mode(frame, template, config)
+        if color == "channels":
+            weights = channel_weights(config.template_option(img_path, "channels", detection["color_channels"]))
+            if weights is not None:
+                return match_template_channels(frame, template, weights, threshold, max_detections)
+        if color == "histogram":
+            min_similarity = config.template_option(img_path, "color_threshold", detection["color_threshold"])
+            accept = lambda detections: histogram_gate(frame, template, detections, min_similarity)
+        else:
+            accept = lambda detections: detections
+
+        tolerance = config.template_option(img_path, "tolerance", detection["exact_tolerance"])
+        strategy = self.tuned_strategy(frame, template, config, threshold, tolerance)
+        if strategy == "exact" or strategy is None and \
+                config.template_option(img_path, "matcher", detection["default_matcher"]) == "exact":
+            return accept(match_exact(frame, template, tolerance, threshold, max_detections))
+
+        # Сначала ищем рядом с прошлыми находками
+        windows = lane.hit_tracker.windows(frame, template) if lane.hit_tracker else None
+        if windows:
+            detections = accept(match_template_windows(frame, template, threshold, max_detections, windows))
+            if detections:
+                lane.hit_tracker.update(frame, template, detections, full_search=False)
+                return detections
+
+        if strategy is not None:
+            detections = match_with(strategy, frame, template, threshold, max_detections, detection, tolerance,
+                                    lane.buffers)
+        # Пирамида нужна только для поиска по всему монитору
+        elif detection["pyramid_mode"] and config.search_area is None and not lane.cropped:
+            detections = match_template_pyramid(frame, template, threshold,
+                                                detection["pyramid_levels"],
+                                                detection["pyramid_candidates"],
+                                                max_detections, lane.buffers)
+        elif lane.tile_matcher:
+            detections = lane.tile_matcher.match(frame, template, threshold, max_detections)
+        elif config.template_option(img_path, "prefilter", detection["anchor_prefilter"]):
+            detections = match_template_anchored(frame, template, threshold, max_detections, lane.buffers)
+        else:
+            detections = match_template(frame, template, threshold, max_detections, lane.buffers)
+        if self.autotuner is not None:
+            self.autotuner.update(frame, template, bool(detections))
+        detections = accept(detections)
+        if lane.hit_tracker:
+            lane.hit_tracker.update(frame, template, detections, full_search=True)
+        return detections
+
+    def tuned_strategy(self, frame, template, config, threshold, tolerance):
+        if self.autotuner is None:
+            return None
+        # Заданный для шаблона вручную способ поиска не перенастраивается
+        if config.template_option(template.path, "matcher") is not None or \
+                config.template_option(template.path, "prefilter") is not None:
+            return None
+        return self.autotuner.strategy_for(frame, template, threshold, config.detection["max_detections"],
+                                           config.detection, tolerance)
+
+    def threshold_for(self, img_path, config):
+        return config.template_option(img_path, "threshold", MATCH_THRESHOLD)
+
+    def color_mode(self, frame, template, config):
+        color = config.template_option(template.path, "color", config.detection["color_mode"])
+        if color == "gray":
+            return color
+        # Без цвета у шаблона или кадра (серая запись) ищем по яркости
+        if template.color is None or frame.color is None:
+            logging.debug(f"No colour for {template.path}, matching in grayscale")
+            return "gray"
+        return color
+
+    def to_click_point(self, frame, x, y, default_monitor, bounds=None):
+        # Координаты клика отсчитываются от основного монитора, клик не выходит за монитор кадра
+        bounds = bounds or default_monitor
+        x, y = frame.to_screen(x, y)
+        x = max(bounds["left"], min(x, bounds["left"] + bounds["width"] - 1))
+        y = max(bounds["top"], min(y, bounds["top"] + bounds["height"] - 1))
+        return x - default_monitor["left"], y - default_monitor["top"]
+
+    def should_click(self, positions, conditions):
+        logging.debug(
+            f"Conditions check: min_images={conditions['min_images']}, found={len(positions)}, click_if_not_found={conditions['click_if_not_found']}")
+        if conditions["click_if_not_found"]:
+            return len(positions) == 0
+        return len(positions) >= conditions["min_images"]
+
+    def actuate(self, cycle, config, region, default_monitor, bounds=None):
+        conditions = config.click_conditions
+        if conditions["max_clicks"] > 0 and self.total_clicks >= conditions["max_clicks"]:
+            logging.info("Max clicks reached, stopping")
+            self.stop()
+            return False
+
+        if cycle.positions:
+            x, y = cycle.positions[0]
+        else:
+            if config.search_area is None:
+                logging.warning("No search area for click_if_not_found, skipping")
+                self.scheduler.wait(self.is_running)
+                return False
+            x, y = self.to_click_point(cycle.frame, region["width"] // 2, region["height"] // 2, default_monitor,
+                                       bounds)
+
+        started = time.perf_counter()
+        clicked = False
+        for _ in range(int(config.clicks_per_cycle)):
+            if not self.running:
+                break
+            self.click(x, y)
+            clicked = True
+            self.total_clicks += 1
+            self.stats.clicks += 1
+            logging.info(f"Click at ({x}, {y}), total_clicks={self.total_clicks}")
+            if self.on_click:
+                self.on_click(x, y, self.total_clicks)
+            self.scheduler.sleep(config.delay_between_clicks)
+        self.stats.add("click", time.perf_counter() - started)
+        if config.sequence_mode:
+            self.image_index += 1
+        self.scheduler.pause(config.delay_after_disappearance, self.is_running)
+        return clicked
@@ -0,0 +1,366 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import cv2
+
+
+class Detection:
+    def __init__(self, x, y, score, path=None):
+        self.x = x
+        self.y = y
+        self.score = score
+        self.path = path
+
+    def __repr__(self):
+        return f"Detection({self.x}, {self.y}, {self.score:.3f})"
+
+
+class Detections(list):
+    # best_score - лучший балл шаблона в кадре, даже если он ниже порога
+    def __init__(self, detections=(), best_score=None):
+        super().__init__(detections)
+        self.best_score = best_score
+
+
+class Frame:
+    def __init__(self, region, gray, timestamp, index=0, pooled=False):
+        self.region = region
+        self.gray = gray
+        self.timestamp = timestamp
+        self.index = index
+        # pooled - пиксели лежат в буфере FrameBuffers и будут перезаписаны,
+        # кто хранит кадр дольше цикла, должен скопировать их
+        self.pooled = pooled
+        self.source = None
+        # color - BGRA-снимок для цветовых режимов, None если источник серый
+        self.color = None
+        self.height, self.width = gray.shape[:2]
+        self._derived = {}
+        self._lock = threading.RLock()
+
+    def crop(self, region):
+        # Вид на часть кадра без копирования; region - абсолютные координаты
+        x = region["left"] - self.region["left"]
+        y = region["top"] - self.region["top"]
+        frame = Frame(region, self.gray[y:y + region["height"], x:x + region["width"]],
+                      self.timestamp, self.index, self.pooled)
+        frame.source = self
+        if self.color is not None:
+            frame.color = self.color[y:y + region["height"], x:x + region["width"]]
+        return frame
+
+    def derived(self, key, factory):
+        # Производные данные кадра (пирамида и т.п.) считаются один раз за цикл,
+        # даже если их одновременно просят несколько потоков пула
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = factory(self)
+            return self._derived[key]
+
+    def to_screen(self, x, y):
+        return x + self.region["left"], y + self.region["top"]
+
+
+class FrameBuffers:
+    # Переиспользуемые массивы вместо выделения памяти на каждый кадр.
+    # Серые кадры идут по кругу из depth буферов одного размера
+    MAX_KEYS = 8
+    MAX_RESULTS = 64
+
+    def __init__(self, depth=2):
+        self.depth = depth
+        self.allocated = 0
+        self._rings = {}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def gray(self, height, width):
+        with self._lock:
+            ring = self._rings.get((height, width))
+            if ring is None:
+                if len(self._rings) >= self.MAX_KEYS:
+                    self._rings.clear()
+                ring = self._rings[(height, width)] = {"buffers": [], "next": 0}
+            if len(ring["buffers"]) < self.depth:
+                ring["buffers"].append(np.empty((height, width), np.uint8))
+                self.allocated += 1
+            buffer = ring["buffers"][ring["next"] % len(ring["buffers"])]
+            ring["next"] += 1
+            return buffer
+
+    def result(self, key, height, width):
+        # Результат matchTemplate нужен только до извлечения пиков; ключ включает
+        # шаблон, поэтому параллельные потоки не делят один буфер
+        key = (key, height, width)
+        with self._lock:
+            buffer = self._results.get(key)
+            if buffer is None:
+                if len(self._results) >= self.MAX_RESULTS:
+                    self._results.clear()
+                buffer = self._results[key] = np.empty((height, width), np.float32)
+                self.allocated += 1
+            return buffer
+
+    def clear(self):
+        with self._lock:
+            self._rings.clear()
+            self._results.clear()
+
+
+def screenshot_to_bgra(screenshot):
+    # У ScreenShot из mss берём сырой буфер без копирования
+    raw = getattr(screenshot, "raw", None)
+    if raw is not None:
+        return np.frombuffer(raw, np.uint8).reshape(screenshot.height, screenshot.width, 4)
+    return np.asarray(screenshot)
+
+
+def capture_frame(sct, region, index=0, clock=time.monotonic, buffers=None):
+    bgra = screenshot_to_bgra(sct.grab(region))
+    gray = buffers.gray(bgra.shape[0], bgra.shape[1]) if buffers is not None else None
+    # Серые записи приходят одним каналом, цвета у такого кадра нет
+    if bgra.ndim == 2:
+        if gray is None:
+            gray = bgra.copy()
+        else:
+            np.copyto(gray, bgra)
+        return Frame(region, gray, clock(), index, pooled=buffers is not None)
+    gray = cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY, dst=gray)
+    frame = Frame(region, gray, clock(), index, pooled=buffers is not None)
+    # Снимок mss не перезаписывается следующим захватом, ссылку можно держать
+    frame.color = bgra
+    return frame
+
+
+MATCH_METHODS = {
+    "ccoeff": cv2.TM_CCOEFF_NORMED,
+    "ccorr": cv2.TM_CCORR_NORMED,
+    "sqdiff": cv2.TM_SQDIFF_NORMED
+}
+
+
+def correlate(image, template, level=0, result=None, frame=None, buffers=None):
+    # frame - кадр, целиком или уровнем пирамиды которого является image: по нему
+    # кэшируются данные кадра, общие для всех шаблонов
+    if template.method == "ccoeff":
+        if template.mask is None:
+            return cv2.matchTemplate(image, template.pyramid(level)[level], cv2.TM_CCOEFF_NORMED, result=result)
+        return masked_correlation(image, template, level, result, frame, buffers)
+    result = cv2.matchTemplate(image, template.pyramid(level)[level], MATCH_METHODS[template.method],
+                               result=result, mask=template.mask_at(level))
+    if template.mask is not None:
+        cv2.patchNaNs(result, 0.0 if template.method == "ccorr" else 1.0)
+    # Для sqdiff меньше - лучше; переворачиваем, чтобы все методы сравнивались с порогом одинаково
+    if template.method == "sqdiff":
+        cv2.subtract(1.0, result, result)
+    return result
+
+
+def float_planes(image, frame=None, buffers=None):
+    # Кадр в float32 и его квадрат нужны каждому шаблону с маской;
+    # для целого кадра или уровня пирамиды считаются раз за цикл
+    def factory(_):
+        if buffers is None:
+            planes = image.astype(np.float32)
+            return planes, cv2.multiply(planes, planes)
+        # Буферы общие на кадр, поэтому только для кэшируемых в кадре данных
+        planes = buffers.result(("float", "planes"), *image.shape)
+        np.copyto(planes, image)
+        return planes, cv2.multiply(planes, planes, dst=buffers.result(("float", "squares"), *image.shape))
+    if frame is None:
+        planes = image.astype(np.float32)
+        return planes, cv2.multiply(planes, planes)
+    return frame.derived(("float", image.shape), factory)
+
+
+def masked_correlation(image, template, level=0, result=None, frame=None, buffers=None):
+    # TM_CCOEFF_NORMED только по непрозрачным пикселям шаблона. Сторона шаблона
+    # посчитана при загрузке, поэтому на кадр три корреляции вместо пяти у matchTemplate(mask=...)
+    zero_mean, weights, count, norm = template.masked(level)
+    image, squares = float_planes(image, frame, buffers)
+    # Сумма шаблона без среднего равна нулю, среднее окна кадра из числителя выпадает
+    result = cv2.matchTemplate(image, zero_mean, cv2.TM_CCORR, result=result)
+    sums = cv2.matchTemplate(image, weights, cv2.TM_CCORR)
+    squares = cv2.matchTemplate(squares, weights, cv2.TM_CCORR)
+    variance = cv2.subtract(squares, cv2.multiply(sums, sums, scale=1.0 / count))
+    # Однотонное под маской окно ни на что не похоже
+    flat = variance < count
+    cv2.sqrt(cv2.max(variance, count), variance)
+    cv2.divide(result, variance, result, scale=1.0 / norm)
+    result[flat] = 0.0
+    return result
+
+
+def match_result(frame, template, buffers=None):
+    result = None
+    if buffers is not None:
+        result = buffers.result(template.path, frame.height - template.height + 1,
+                                frame.width - template.width + 1)
+    return correlate(frame.gray, template, result=result, frame=frame, buffers=buffers)
+
+
+def top_peaks(result, count, min_score, radius_x, radius_y):
+    # Итеративный minMaxLoc с маскированием окрестности найденного пика
+    peaks = []
+    masked = None
+    best_score = None
+    while len(peaks) < count:
+        _, score, _, (x, y) = cv2.minMaxLoc(result if masked is None else masked)
+        if best_score is None:
+            best_score = score
+        if score < min_score:
+            break
+        peaks.append((score, x, y))
+        if masked is None:
+            masked = result.copy()
+        masked[max(0, y - radius_y):y + radius_y + 1, max(0, x - radius_x):x + radius_x + 1] = -1.0
+    return peaks, best_score
+
+
+def merge_detections(parts, radius_x, radius_y, limit, best_score=None):
+    kept = Detections(best_score=best_score)
+    for part in parts:
+        if part.best_score is not None and (kept.best_score is None or part.best_score > kept.best_score):
+            kept.best_score = part.best_score
+    for detection in sorted((d for part in parts for d in part), key=lambda d: -d.score):
+        if len(kept) >= limit:
+            break
+        if all(abs(detection.x - k.x) > radius_x or abs(detection.y - k.y) > radius_y for k in kept):
+            kept.append(detection)
+    return kept
+
+
+def result_to_detections(result, template, threshold, max_detections, offset_x=0, offset_y=0):
+    # Один пик на объект: окрестность размером в полшаблона подавляется
+    peaks, best_score = top_peaks(result, max_detections, threshold, template.width // 2, template.height // 2)
+    return Detections((Detection(offset_x + x + template.width // 2, offset_y + y + template.height // 2,
+                                 score, template.path)
+                       for score, x, y in peaks), best_score)
+
+
+def match_template(frame, template, threshold, max_detections, buffers=None):
+    if template.width > frame.width or template.height > frame.height:
+        logging.warning(f"Template {template.path} is larger than search region {frame.width}x{frame.height}")
+        return Detections()
+    result = match_result(frame, template, buffers)
+    return result_to_detections(result, template, threshold, max_detections)
+
+
+def match_template_windows(frame, template, threshold, max_detections, windows):
+    parts = []
+    for x0, y0, x1, y1 in windows:
+        window = frame.gray[y0:y1, x0:x1]
+        if window.shape[0] < template.height or window.shape[1] < template.width:
+            continue
+        result = correlate(window, template)
+        parts.append(result_to_detections(result, template, threshold, max_detections, x0, y0))
+    return merge_detections(parts, template.width // 2, template.height // 2, max_detections)
+
+
+# Порог на грубом уровне ниже основного: уменьшенные копии коррелируют слабее
+PYRAMID_COARSE_RATIO = 0.75
+PYRAMID_MIN_TEMPLATE_SIDE = 8
+
+
+def build_pyramid(frame, levels, buffers=None):
+    def factory(frame):
+        pyramid = [frame.gray]
+        for _ in range(levels):
+            height, width = pyramid[-1].shape
+            dst = buffers.gray((height + 1) // 2, (width + 1) // 2) if buffers is not None else None
+            pyramid.append(cv2.pyrDown(pyramid[-1], dst=dst))
+        return pyramid
+    return frame.derived(("pyramid", levels), factory)
+
+
+def usable_pyramid_levels(frame, template, levels):
+    usable = 0
+    for level in range(1, levels + 1):
+        if min(template.width, template.height) >> level < PYRAMID_MIN_TEMPLATE_SIDE:
+            break
+        if template.width > frame.width >> level or template.height > frame.height >> level:
+            break
+        usable = level
+    return usable
+
+
+def match_template_pyramid(frame, template, threshold, levels, candidates, max_detections, buffers=None):
+    levels = usable_pyramid_levels(frame, template, levels)
+    if levels == 0:
+        return match_template(frame, template, threshold, max_detections, buffers)
+
+    frame_level = build_pyramid(frame, levels, buffers)[levels]
+    template_level = template.pyramid(levels)[levels]
+    th, tw = template_level.shape[:2]
+    coarse = None
+    if buffers is not None:
+        coarse = buffers.result((template.path, "pyramid", levels), frame_level.shape[0] - th + 1,
+                                frame_level.shape[1] - tw + 1)
+    coarse = correlate(frame_level, template, levels, coarse, frame, buffers)
+    peaks, coarse_best = top_peaks(coarse, candidates, threshold * PYRAMID_COARSE_RATIO, tw // 2, th // 2)
+
+    # Уточняем каждого кандидата в небольшой окрестности на полном разрешении
+    scale = 1 << levels
+    pad = scale + 2
+    parts = []
+    for _, cx, cy in peaks:
+        x0 = max(0, cx * scale - pad)
+        y0 = max(0, cy * scale - pad)
+        x1 = min(frame.width, cx * scale + pad + template.width)
+        y1 = min(frame.height, cy * scale + pad + template.height)
+        window = frame.gray[y0:y1, x0:x1]
+        if window.shape[0] < template.height or window.shape[1] < template.width:
+            continue
+        result = correlate(window, template)
+        parts.append(result_to_detections(result, template, threshold, 1, x0, y0))
+    # Без кандидатов ориентируемся на грубый балл
+    best_score = coarse_best if not parts else None
+    return merge_detections(parts, template.width // 2, template.height // 2, max_detections, best_score)
+
+
+class MatchPool:
+    def __init__(self, workers=0):
+        # 0 - по числу ядер, 1 - без пула, всё в текущем потоке
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="match")
+        logging.debug(f"Match pool: {self.workers} worker(s)")
+
+    def map(self, fn, items):
+        items = list(items)
+        if self._executor is None or len(items) < 2:
+            return [fn(item) for item in items]
+        return list(self._executor.map(fn, items))
+
+    def map_while(self, fn, items, limit, wanted):
+        # Не больше limit задач одновременно; следующая задача ставится, только
+        # если wanted(item) ещё нужен с учётом уже готовых результатов.
+        # Возвращает {item: результат} для выполненных
+        results = {}
+        items = list(items)
+        in_flight = {}
+        limit = max(1, min(limit, self.workers))
+        while items or in_flight:
+            while items and len(in_flight) < limit:
+                item = items.pop(0)
+                if not wanted(item):
+                    continue
+                if self._executor is None:
+                    results[item] = fn(item)
+                else:
+                    in_flight[self._executor.submit(fn, item)] = item
+            if not in_flight:
+                continue
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[in_flight.pop(future)] = future.result()
+        return results
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,81 @@
+import logging
+import numpy as np
+import cv2
+from .detection import Detection, Detections, merge_detections, match_template
+
+# Точный поиск для спрайтов интерфейса, которые рисуются пиксель в пиксель:
+# кандидаты отбираются по нескольким редким пикселям шаблона, затем проверяются целиком
+EXACT_SAMPLES = 16
+EXACT_MASK_SAMPLES = 3
+EXACT_MIN_AGREEMENT = 0.98
+EXACT_MAX_CANDIDATES = 5000
+
+
+def pixel_signature(template, samples):
+    # Самые редкие по яркости пиксели шаблона, не больше одного на клетку сетки
+    image = template.image
+    visible = image if template.mask is None else image[template.mask > 0]
+    histogram = np.bincount(visible.ravel(), minlength=256)
+    order = np.argsort(histogram[image], axis=None, kind="stable")
+    if template.mask is not None:
+        # Прозрачные пиксели в подпись не попадают
+        order = order[template.mask.ravel()[order] > 0]
+    cell = max(1, min(template.width, template.height) // 4)
+    points = []
+    cells = set()
+    for index in order:
+        y, x = divmod(int(index), template.width)
+        if (y // cell, x // cell) in cells:
+            continue
+        cells.add((y // cell, x // cell))
+        points.append((y, x))
+        if len(points) >= samples:
+            break
+    ys = np.array([y for y, _ in points], np.intp)
+    xs = np.array([x for _, x in points], np.intp)
+    return ys, xs, image[ys, xs].astype(np.int16)
+
+
+def match_exact(frame, template, tolerance, threshold, max_detections):
+    if template.width > frame.width or template.height > frame.height:
+        logging.warning(f"Template {template.path} is larger than search region {frame.width}x{frame.height}")
+        return Detections()
+
+    ys, xs, values = template.derived(("signature", EXACT_SAMPLES),
+                                      lambda template: pixel_signature(template, EXACT_SAMPLES))
+    gray = frame.gray
+    result_height = frame.height - template.height + 1
+    result_width = frame.width - template.width + 1
+    # Первые точки подписи отбирают кандидатов масками по всему кадру,
+    # остальные проверяются только в оставшихся позициях
+    mask = None
+    for y, x, value in zip(ys[:EXACT_MASK_SAMPLES], xs[:EXACT_MASK_SAMPLES], values[:EXACT_MASK_SAMPLES]):
+        view = gray[y:y + result_height, x:x + result_width]
+        sample = cv2.inRange(view, max(0, int(value) - tolerance), min(255, int(value) + tolerance))
+        mask = sample if mask is None else cv2.bitwise_and(mask, sample, dst=mask)
+    candidates_y, candidates_x = np.nonzero(mask)
+    for y, x, value in zip(ys[EXACT_MASK_SAMPLES:], xs[EXACT_MASK_SAMPLES:], values[EXACT_MASK_SAMPLES:]):
+        if not len(candidates_y):
+            break
+        keep = np.abs(gray[candidates_y + y, candidates_x + x].astype(np.int16) - value) <= tolerance
+        candidates_y, candidates_x = candidates_y[keep], candidates_x[keep]
+
+    # Однотонный шаблон подписью не отсечь - считаем корреляцию
+    if len(candidates_y) > EXACT_MAX_CANDIDATES:
+        logging.debug(f"Exact match of {template.path}: {len(candidates_y)} candidates, using correlation")
+        return match_template(frame, template, threshold, max_detections)
+
+    detections = Detections()
+    pixels = template.width * template.height if template.mask is None else cv2.countNonZero(template.mask)
+    for y, x in zip(candidates_y, candidates_x):
+        window = gray[y:y + template.height, x:x + template.width]
+        close = cv2.inRange(cv2.absdiff(window, template.image), 0, tolerance)
+        if template.mask is not None:
+            close = cv2.bitwise_and(close, template.mask, dst=close)
+        agreement = cv2.countNonZero(close) / pixels
+        if detections.best_score is None or agreement > detections.best_score:
+            detections.best_score = agreement
+        if agreement >= EXACT_MIN_AGREEMENT:
+            detections.append(Detection(int(x) + template.width // 2, int(y) + template.height // 2,
+                                        agreement, template.path))
+    return merge_detections([detections], template.width // 2, template.height // 2, max_detections)
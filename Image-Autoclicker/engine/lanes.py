@@ -0,0 +1,55 @@
+from .detection import FrameBuffers
+from .tracking import HitTracker
+from .change_detector import ChangeDetector
+from .tile_matching import TileMatcher
+
+MAIN_LANE = "main"
+REGIONS_LANE = "regions"
+
+
+def area_to_region(area, monitors):
+    # Область из настроек задаётся относительно монитора monitor_idx
+    index = area.get("monitor_idx", 1)
+    if not 0 <= index < len(monitors):
+        return None
+    monitor = monitors[index]
+    return {
+        "left": monitor["left"] + area["left"],
+        "top": monitor["top"] + area["top"],
+        "width": area["width"],
+        "height": area["height"]
+    }
+
+
+def union_region(regions):
+    left = min(region["left"] for region in regions)
+    top = min(region["top"] for region in regions)
+    right = max(region["left"] + region["width"] for region in regions)
+    bottom = max(region["top"] + region["height"] for region in regions)
+    return {"left": left, "top": top, "width": right - left, "height": bottom - top}
+
+
+class SearchLane:
+    # Состояние поиска в одной области экрана: у каждого монитора своё,
+    # иначе трекинг, детектор изменений и тайлы сбрасывались бы каждый цикл
+    def __init__(self, name, detection, buffer_depth=2, cropped=False):
+        self.name = name
+        # cropped - поиск в вырезке именованной области, а не по всему снимку
+        self.cropped = cropped
+        self.hit_tracker = None
+        if detection["tracking"]:
+            self.hit_tracker = HitTracker(detection["tracking_padding"], detection["tracking_full_search_every"])
+        self.change_detector = None
+        if detection["skip_unchanged_frames"]:
+            self.change_detector = ChangeDetector(detection["change_threshold"], detection["change_refresh_every"])
+        self.tile_matcher = None
+        if detection["dirty_tiles"]:
+            self.tile_matcher = TileMatcher(detection["tile_size"], detection["change_threshold"],
+                                            detection["change_refresh_every"])
+        self.buffers = FrameBuffers(buffer_depth)
+        self.previous_key = None
+        self.results = []
+        self.frame_changed = True
+
+    def close(self):
+        self.buffers.clear()
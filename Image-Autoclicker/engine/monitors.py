@@ -0,0 +1,70 @@
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+
+def select_monitors(monitors, selection):
+    # selection - "all" или номера мониторов mss (с 1, monitors[0] - весь рабочий стол)
+    if selection == "all":
+        return list(range(1, len(monitors)))
+    selected = []
+    for index in selection or []:
+        if 1 <= index < len(monitors) and index not in selected:
+            selected.append(index)
+        elif index not in selected:
+            logging.warning(f"Monitor {index} not found, {len(monitors) - 1} monitor(s) available")
+    return selected
+
+
+class MonitorWorkers:
+    # По потоку на монитор: поток снимает свой монитор и сопоставляет шаблоны.
+    # mss привязан к потоку, поэтому при живом экране у каждого потока свой экземпляр,
+    # а общий источник (воспроизведение) снимается по очереди под замком
+    def __init__(self, screen, screen_factory=None):
+        self.screen = screen
+        self.screen_factory = screen_factory
+        self._executors = {}
+        self._local = threading.local()
+        self._screen_lock = threading.Lock()
+
+    def grab(self, region):
+        # Вне потоков мониторов (один монитор в цикле) снимает экран движка,
+        # созданный в его потоке, - свой экземпляр там не нужен и не закрывался бы
+        if self.screen_factory is None or not getattr(self._local, "worker", False):
+            with self._screen_lock:
+                return self.screen.grab(region)
+        screen = getattr(self._local, "screen", None)
+        if screen is None:
+            screen = self._local.screen = self.screen_factory()
+        return screen.grab(region)
+
+    def map(self, fn, keys):
+        # Результаты идут в порядке ключей
+        futures = []
+        for key in keys:
+            executor = self._executors.get(key)
+            if executor is None:
+                executor = self._executors[key] = ThreadPoolExecutor(max_workers=1,
+                                                                     thread_name_prefix=f"monitor{key}")
+            futures.append(executor.submit(self._work, fn, key))
+        return [future.result() for future in futures]
+
+    def _work(self, fn, key):
+        self._local.worker = True
+        return fn(key)
+
+    def _close_screen(self):
+        screen = getattr(self._local, "screen", None)
+        if screen is not None:
+            screen.close()
+            self._local.screen = None
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            if self.screen_factory is not None:
+                try:
+                    executor.submit(self._close_screen).result(timeout=1.0)
+                except Exception as e:
+                    logging.error(f"Error closing monitor capture: {e}")
+            executor.shutdown(wait=False)
+        self._executors = {}
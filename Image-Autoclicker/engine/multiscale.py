@@ -0,0 +1,81 @@
+import threading
+import logging
+import cv2
+from .template_cache import Template
+from .detection import build_pyramid, usable_pyramid_levels, correlate
+
+
+def scaled_templates(template, scales):
+    # Копии шаблона во всех масштабах готовятся один раз на загруженный шаблон
+    def factory(template):
+        variants = {}
+        for scale in scales:
+            if scale == 1.0:
+                variants[scale] = template
+                continue
+            width = max(4, round(template.width * scale))
+            height = max(4, round(template.height * scale))
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            mask = None
+            if template.mask is not None:
+                mask = cv2.resize(template.mask, (width, height), interpolation=cv2.INTER_NEAREST)
+            color = None
+            if template.color is not None:
+                color = cv2.resize(template.color, (width, height), interpolation=interpolation)
+            variant = Template(template.path, cv2.resize(template.image, (width, height), interpolation=interpolation),
+                               template.mtime, template.file_size, mask, color)
+            variant.scale = scale
+            variants[scale] = variant
+        return variants
+    return template.derived(("scales", tuple(scales)), factory)
+
+
+class ScaleSelector:
+    # Масштаб выбирается грубым поиском на уменьшенном кадре и запоминается
+    # для шаблона на каждом мониторе (полосе); после retry_after промахов подряд
+    # выбор повторяется
+    def __init__(self, scales, retry_after=5):
+        self.scales = [float(scale) for scale in scales] or [1.0]
+        self.retry_after = retry_after
+        self.selections = 0
+        self._chosen = {}
+        self._lock = threading.Lock()
+
+    def template_for(self, frame, template, lane):
+        variants = scaled_templates(template, self.scales)
+        key = (lane, template.path)
+        with self._lock:
+            state = self._chosen.get(key)
+        if state is None or state["misses"] >= self.retry_after or state["template"] is not template:
+            scale = self.select(frame, variants)
+            state = {"scale": scale, "misses": 0, "template": template}
+            with self._lock:
+                self._chosen[key] = state
+                self.selections += 1
+            logging.debug(f"Scale of {template.path} on {lane}: {scale}")
+        return variants[state["scale"]]
+
+    def select(self, frame, variants):
+        fitting = {scale: variant for scale, variant in variants.items()
+                   if variant.width <= frame.width and variant.height <= frame.height}
+        if not fitting:
+            return next(iter(variants))
+        level = min(usable_pyramid_levels(frame, variant, 1) for variant in fitting.values())
+        image = build_pyramid(frame, level)[level]
+        best_scale, best_score = next(iter(fitting)), None
+        for scale, variant in fitting.items():
+            result = correlate(image, variant, level, frame=frame)
+            score = cv2.minMaxLoc(result)[1]
+            if best_score is None or score > best_score:
+                best_scale, best_score = scale, score
+        return best_scale
+
+    def update(self, lane, path, found):
+        with self._lock:
+            state = self._chosen.get((lane, path))
+            if state is not None:
+                state["misses"] = 0 if found else state["misses"] + 1
+
+    def forget(self):
+        with self._lock:
+            self._chosen.clear()
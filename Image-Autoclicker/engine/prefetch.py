@@ -0,0 +1,123 @@
+import time
+import threading
+import logging
+from .detection import capture_frame
+from .capture import CaptureExhausted
+
+
+class CapturePrefetcher:
+    # Следующий кадр снимается в отдельном потоке к дедлайну следующего цикла,
+    # который сообщает планировщик, - пока движок спит. В слоте всегда самый
+    # новый снимок: следующий снимок заменяет незабранный
+    def __init__(self, screen_factory, buffers, clock):
+        self.screen_factory = screen_factory
+        self.buffers = buffers
+        self.clock = clock
+        self.captured = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._region = None
+        self._slot = None
+        self._error = None
+        self._deadline = None
+        self._wanted = False
+        self._capture_seconds = 0.0
+        self._running = True
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
+        self._thread.start()
+
+    def schedule(self, deadline):
+        # Снимок начинается заранее на среднее время захвата, чтобы быть готовым к дедлайну
+        with self._condition:
+            self._deadline = deadline
+            self._condition.notify_all()
+
+    def take(self, region, max_age):
+        with self._condition:
+            if self._region != region:
+                self._region = dict(region)
+                self._condition.notify_all()
+            waited = False
+            while True:
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    self._condition.notify_all()
+                    raise error
+                if not self._running:
+                    raise CaptureExhausted("Capture prefetch stopped")
+                frame = self._slot
+                if frame is not None:
+                    self._slot = None
+                    # Снимок другой области или пролежавший дольше max_age не годится
+                    if frame.region == region and self.clock() - frame.timestamp <= max_age:
+                        self._wanted = False
+                        if waited:
+                            self.misses += 1
+                        else:
+                            self.hits += 1
+                        return frame
+                    self.stale += 1
+                # Готового кадра нет - снимаем сразу
+                self._wanted = True
+                waited = True
+                self._condition.notify_all()
+                self._condition.wait()
+
+    def _due(self):
+        # Сколько ждать до следующего снимка, None - пока не нужен
+        if self._region is None or self._error is not None:
+            return None
+        if self._wanted and self._slot is None:
+            return 0.0
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - self._capture_seconds - self.clock())
+
+    def _run(self):
+        # mss привязан к потоку, поэтому у потока захвата свой экземпляр
+        screen = None
+        try:
+            screen = self.screen_factory()
+            while True:
+                with self._condition:
+                    while self._running:
+                        due = self._due()
+                        if due == 0.0:
+                            break
+                        self._condition.wait(due)
+                    if not self._running:
+                        return
+                    self._deadline = None
+                    region = self._region
+                started = time.perf_counter()
+                try:
+                    frame = capture_frame(screen, region, self.captured, self.clock, self.buffers)
+                except Exception as e:
+                    with self._condition:
+                        self._error = e
+                        self._condition.notify_all()
+                    continue
+                seconds = time.perf_counter() - started
+                with self._condition:
+                    self.captured += 1
+                    self._capture_seconds = seconds if self.captured == 1 else \
+                        0.8 * self._capture_seconds + 0.2 * seconds
+                    self._slot = frame
+                    self._condition.notify_all()
+        except Exception as e:
+            logging.error(f"Capture thread failed: {e}")
+            with self._condition:
+                self._error = e
+                self._running = False
+                self._condition.notify_all()
+        finally:
+            if screen is not None:
+                screen.close()
+
+    def close(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join(timeout=1.0)
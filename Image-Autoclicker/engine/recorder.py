@@ -0,0 +1,239 @@
+import os
+import sys
+import mmap
+import json
+import struct
+import logging
+import argparse
+import numpy as np
+
+# Формат файла: заголовок + N одинаковых слотов, слот = заголовок кадра,
+# JSON с найденными объектами и пиксели серого кадра фиксированного размера.
+# Пишутся только изменившиеся кадры; циклы без изменений считаются в repeats
+# заголовка последнего кадра той же области
+MAGIC = b"ACRING01"
+FILE_HEADER = struct.Struct("<8sIIIIQ")
+FILE_HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<QdiiIII")
+SLOT_HEADER_SIZE = 64
+META_SIZE = 2048
+
+
+class RecordedFrame:
+    def __init__(self, sequence, timestamp, region, gray, detections, repeats=0):
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.region = region
+        self.gray = gray
+        self.detections = detections
+        # Сколько следующих циклов экран не менялся
+        self.repeats = repeats
+
+
+class SessionRecorder:
+    def __init__(self, path, size_mb=256):
+        self.path = path
+        self.size_bytes = int(size_mb * 1024 * 1024)
+        self.frame_width = 0
+        self.frame_height = 0
+        self.slot_count = 0
+        self.written = 0
+        self.repeated = 0
+        self._file = None
+        self._map = None
+        self._cropped_warning = False
+        # Последний записанный слот каждой области: (номер кадра, смещение, repeats)
+        self._last = {}
+
+    def _open(self, width, height):
+        # Размер слота задаётся первым кадром, файл выделяется сразу целиком
+        self.frame_width, self.frame_height = width, height
+        slot_size = SLOT_HEADER_SIZE + META_SIZE + width * height
+        self.slot_count = max(1, (self.size_bytes - FILE_HEADER_SIZE) // slot_size)
+        total = FILE_HEADER_SIZE + self.slot_count * slot_size
+        self._file = open(self.path, "w+b")
+        self._file.truncate(total)
+        self._map = mmap.mmap(self._file.fileno(), total)
+        self._write_file_header()
+        logging.info(f"Recording session to {self.path}: {self.slot_count} frames of {width}x{height}")
+
+    def _write_file_header(self):
+        FILE_HEADER.pack_into(self._map, 0, MAGIC, self.slot_count, self.frame_width, self.frame_height,
+                              META_SIZE, self.written)
+
+    def _slot_offset(self, slot):
+        return FILE_HEADER_SIZE + slot * (SLOT_HEADER_SIZE + META_SIZE + self.frame_width * self.frame_height)
+
+    def record(self, frame, detections=()):
+        if self._map is None:
+            self._open(frame.width, frame.height)
+        height = min(frame.height, self.frame_height)
+        width = min(frame.width, self.frame_width)
+        if (height, width) != (frame.height, frame.width) and not self._cropped_warning:
+            logging.warning(f"Frame {frame.width}x{frame.height} is larger than recorder slots, cropping")
+            self._cropped_warning = True
+
+        offset = self._slot_offset(self.written % self.slot_count)
+        # Сначала помечаем слот как пустой, номер кадра пишется последним:
+        # читатель не увидит наполовину записанный слот
+        struct.pack_into("<Q", self._map, offset, 0)
+        pixels = np.frombuffer(self._map, np.uint8, self.frame_width * self.frame_height,
+                               offset + SLOT_HEADER_SIZE + META_SIZE)
+        pixels.reshape(self.frame_height, self.frame_width)[:height, :width] = frame.gray[:height, :width]
+        self._map[offset + SLOT_HEADER_SIZE:offset + SLOT_HEADER_SIZE + META_SIZE] = _encode_detections(detections)
+        self.written += 1
+        SLOT_HEADER.pack_into(self._map, offset, self.written, frame.timestamp, frame.region["left"],
+                              frame.region["top"], width, height, 0)
+        self._write_file_header()
+        self._last[_region_key(frame.region)] = [self.written, offset, 0]
+
+    def repeat(self, frame):
+        # Неизменный кадр не занимает слот: увеличиваем счётчик у последнего кадра области
+        last = self._last.get(_region_key(frame.region))
+        if self._map is None or last is None or last[0] <= self.written - self.slot_count:
+            return False
+        last[2] += 1
+        struct.pack_into("<I", self._map, last[1] + SLOT_HEADER.size - 4, last[2])
+        self.repeated += 1
+        return True
+
+    def record_cycle(self, cycle):
+        # Вырезки областей из одного снимка пишутся одним кадром в его координатах
+        frames = {}
+        changed = set()
+        for part in cycle.parts:
+            source = part.frame.source or part.frame
+            _, detections = frames.setdefault(id(source), (source, []))
+            if part.matched:
+                changed.add(id(source))
+            dx = part.frame.region["left"] - source.region["left"]
+            dy = part.frame.region["top"] - source.region["top"]
+            for path, found in zip(part.images, part.results):
+                for detection in found:
+                    detections.append({"template": os.path.basename(path), "x": detection.x + dx,
+                                       "y": detection.y + dy, "score": round(float(detection.score), 4)})
+        for key, (source, detections) in frames.items():
+            if key in changed or not self.repeat(source):
+                self.record(source, detections)
+
+    def close(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
+
+
+class RingReader:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.slot_count, self.frame_width, self.frame_height, meta_size, self.written = \
+            FILE_HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a session recording")
+        self.meta_size = meta_size
+        self.slot_size = SLOT_HEADER_SIZE + meta_size + self.frame_width * self.frame_height
+
+    def __len__(self):
+        return min(self.written, self.slot_count)
+
+    def __iter__(self):
+        # От самого старого сохранившегося кадра к самому новому
+        for sequence in range(self.written - len(self) + 1, self.written + 1):
+            frame = self.read(sequence)
+            if frame is not None:
+                yield frame
+
+    def __getitem__(self, index):
+        frame = self.read(self.written - len(self) + 1 + index)
+        if frame is None:
+            raise IndexError(index)
+        return frame
+
+    def read(self, sequence):
+        offset = FILE_HEADER_SIZE + ((sequence - 1) % self.slot_count) * self.slot_size
+        stored, timestamp, left, top, width, height, repeats = SLOT_HEADER.unpack_from(self._map, offset)
+        if stored != sequence:
+            return None
+        # Представление поверх mmap, без копирования пикселей
+        pixels = np.frombuffer(self._map, np.uint8, self.frame_width * self.frame_height,
+                               offset + SLOT_HEADER_SIZE + self.meta_size)
+        gray = pixels.reshape(self.frame_height, self.frame_width)[:height, :width]
+        region = {"left": left, "top": top, "width": width, "height": height}
+        meta = bytes(self._map[offset + SLOT_HEADER_SIZE:offset + SLOT_HEADER_SIZE + self.meta_size])
+        return RecordedFrame(sequence, timestamp, region, gray, _decode_detections(meta), repeats)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def _region_key(region):
+    return region["left"], region["top"], region["width"], region["height"]
+
+
+def read_recent(path, count):
+    # Копии последних кадров записи: представления поверх mmap не переживают close
+    reader = RingReader(path)
+    try:
+        recorded = list(reader)[-count:] if count > 0 else []
+        frames = [frame.gray.copy() for frame in recorded]
+        del recorded
+    finally:
+        reader.close()
+    return frames
+
+
+def _encode_detections(detections):
+    detections = list(detections)
+    # Не влезающие в слот объекты отбрасываются с конца
+    while True:
+        data = json.dumps(detections, separators=(",", ":")).encode("utf-8")
+        if len(data) <= META_SIZE or not detections:
+            return data[:META_SIZE].ljust(META_SIZE, b"\0")
+        detections.pop()
+
+
+def _decode_detections(meta):
+    data = meta.rstrip(b"\0")
+    if not data:
+        return []
+    try:
+        return json.loads(data)
+    except ValueError:
+        return []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m engine.recorder", description="Inspect a session recording")
+    parser.add_argument("path")
+    parser.add_argument("--export", help="write the frames as PNG files to this directory")
+    args = parser.parse_args(argv)
+
+    reader = RingReader(args.path)
+    frames = []
+    try:
+        frames = list(reader)
+        print(f"{args.path}: {len(frames)} of {reader.written} frames kept, "
+              f"slots {reader.slot_count} x {reader.frame_width}x{reader.frame_height}")
+        if frames:
+            print(f"span {frames[-1].timestamp - frames[0].timestamp:.1f}s, "
+                  f"{len(frames) + sum(frame.repeats for frame in frames)} cycles, "
+                  f"{sum(1 for frame in frames if frame.detections)} frames with detections")
+        if args.export:
+            import cv2
+            os.makedirs(args.export, exist_ok=True)
+            for frame in frames:
+                cv2.imwrite(os.path.join(args.export, f"{frame.sequence:08d}.png"), frame.gray)
+    finally:
+        del frames
+        reader.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
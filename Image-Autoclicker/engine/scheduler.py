@@ -0,0 +1,52 @@
+import time
+
+
+class PollScheduler:
+    def __init__(self, min_interval=0.1, max_interval=0.5, backoff=1.5, near_margin=0.1,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.near_margin = near_margin
+        self.interval = min_interval
+        self.clock = clock
+        self.sleep = sleep
+        self._deadline = None
+        self._changed = False
+        # Вызывается с дедлайном следующего цикла перед сном (снимок заранее)
+        self.on_wait = None
+
+    def update(self, found=False, changed=False, best_score=None, threshold=None):
+        # Быстрый опрос, когда экран только начал меняться или цель близко,
+        # иначе плавно замедляемся. Постоянная анимация ускоряет опрос лишь один раз
+        near = best_score is not None and threshold is not None and best_score >= threshold - self.near_margin
+        started_changing = changed and not self._changed
+        self._changed = changed
+        if found or started_changing or near:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def wait(self, is_running):
+        # Дедлайны отсчитываются от предыдущего, а не от конца обработки,
+        # поэтому время сопоставления не накапливается в интервале
+        now = self.clock()
+        if self._deadline is None:
+            self._deadline = now
+        self._deadline = max(self._deadline + self.interval, now)
+        if self.on_wait is not None:
+            self.on_wait(self._deadline)
+        self._sleep_until(self._deadline, is_running)
+
+    def pause(self, seconds, is_running):
+        self._sleep_until(self.clock() + seconds, is_running)
+        self.interval = self.min_interval
+        self._deadline = self.clock()
+
+    def _sleep_until(self, deadline, is_running):
+        # Спим короткими отрезками, чтобы остановка срабатывала сразу
+        while is_running():
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                break
+            self.sleep(min(remaining, 0.1))
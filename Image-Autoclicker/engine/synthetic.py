@@ -0,0 +1,131 @@
+import numpy as np
+import cv2
+
+
+def make_sprite(rng, width, height, transparent=False):
+    # Текстура с крупными деталями, похожая на иконку интерфейса
+    small = rng.integers(0, 256, (max(2, height // 6), max(2, width // 6), 3), dtype=np.uint8)
+    sprite = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    cv2.rectangle(sprite, (0, 0), (width - 1, height - 1), [int(c) for c in rng.integers(0, 256, 3)], 2)
+    if transparent:
+        # Круглая иконка на прозрачном фоне
+        alpha = np.zeros((height, width), np.uint8)
+        cv2.ellipse(alpha, (width // 2, height // 2), (width // 2 - 1, height // 2 - 1), 0, 0, 360, 255, -1)
+        sprite = np.dstack([sprite, alpha])
+    return sprite
+
+
+def desaturate(sprite):
+    # Серая копия - как неактивная кнопка того же вида
+    gray = cv2.cvtColor(cv2.cvtColor(sprite[:, :, :3], cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR)
+    if sprite.shape[2] == 4:
+        gray = np.dstack([gray, sprite[:, :, 3]])
+    return gray
+
+
+def paste(frame, x, y, sprite):
+    height, width = sprite.shape[:2]
+    if sprite.shape[2] == 3:
+        frame[y:y + height, x:x + width] = sprite
+        return
+    alpha = sprite[:, :, 3:].astype(np.float32) / 255.0
+    target = frame[y:y + height, x:x + width]
+    target[:] = (sprite[:, :, :3] * alpha + target * (1.0 - alpha)).astype(np.uint8)
+
+
+def make_background(rng, width, height):
+    gradient = np.linspace(40, 90, width, dtype=np.float32)
+    background = np.repeat(gradient[None, :, None], height, axis=0).repeat(3, axis=2)
+    background = background.astype(np.uint8)
+    # "Окна" приложений
+    for _ in range(12):
+        x0, y0 = int(rng.integers(0, width - 100)), int(rng.integers(0, height - 100))
+        x1, y1 = x0 + int(rng.integers(100, width // 3)), y0 + int(rng.integers(100, height // 3))
+        color = [int(c) for c in rng.integers(20, 230, 3)]
+        cv2.rectangle(background, (x0, y0), (x1, y1), color, -1)
+    noise = rng.normal(0, 2, background.shape)
+    return np.clip(background + noise, 0, 255).astype(np.uint8)
+
+
+class SyntheticScene:
+    def __init__(self, width, height, templates, seed=0, copies=2, distractors=6,
+                 noise=3.0, scale_jitter=0.03, move_probability=0.1, clock_every=10, scale=1.0,
+                 lookalikes=0):
+        self.rng = np.random.default_rng(seed)
+        self.width = width
+        self.height = height
+        self.templates = templates
+        self.copies = copies
+        self.noise = noise
+        self.scale_jitter = scale_jitter
+        # scale - масштаб экрана (DPI), jitter добавляется поверх него
+        self.scale = scale
+        self.move_probability = move_probability
+        self.clock_every = clock_every
+        self.background = make_background(self.rng, width, height)
+        self.distractors = [self._place(make_sprite(self.rng, 48, 48)) for _ in range(distractors)]
+        # lookalikes - серые копии каждого шаблона, цветовые режимы должны их отсеять
+        for name in templates:
+            self.distractors += [self._place(self._jitter(desaturate(templates[name]))) for _ in range(lookalikes)]
+        self.placements = {}
+        for name in templates:
+            self.placements[name] = [self._place(self._jitter(templates[name]))
+                                     for _ in range(int(self.rng.integers(0, copies + 1)))]
+        self.step = 0
+        self._frame = None
+
+    def _jitter(self, sprite):
+        if self.scale_jitter <= 0 and self.scale == 1.0:
+            return sprite
+        scale = self.scale
+        if self.scale_jitter > 0:
+            scale *= 1 + self.rng.uniform(-self.scale_jitter, self.scale_jitter)
+        height, width = sprite.shape[:2]
+        return cv2.resize(sprite, (max(4, round(width * scale)), max(4, round(height * scale))),
+                          interpolation=cv2.INTER_LINEAR)
+
+    def _place(self, sprite):
+        height, width = sprite.shape[:2]
+        x = int(self.rng.integers(0, self.width - width))
+        y = int(self.rng.integers(60, self.height - height))
+        return x, y, sprite
+
+    def _render(self):
+        frame = self.background.copy()
+        for x, y, sprite in self.distractors:
+            paste(frame, x, y, sprite)
+        for placements in self.placements.values():
+            for x, y, sprite in placements:
+                paste(frame, x, y, sprite)
+        if self.noise > 0:
+            frame = np.clip(frame + self.rng.normal(0, self.noise, frame.shape), 0, 255).astype(np.uint8)
+        return frame
+
+    def _draw_clock(self, frame):
+        # Часы в углу меняются раз в clock_every кадров
+        tick = self.step // self.clock_every if self.clock_every > 0 else self.step
+        frame[10:40, self.width - 200:self.width - 10] = 30
+        cv2.putText(frame, f"{tick:06d}", (self.width - 195, 35), cv2.FONT_HERSHEY_SIMPLEX, 0.9,
+                    (230, 230, 230), 2)
+
+    def next_frame(self):
+        moved = False
+        if self._frame is None:
+            moved = True
+        elif self.rng.random() < self.move_probability:
+            name = list(self.templates)[int(self.rng.integers(0, len(self.templates)))]
+            self.placements[name] = [self._place(self._jitter(self.templates[name]))
+                                     for _ in range(int(self.rng.integers(0, self.copies + 1)))]
+            moved = True
+        if moved:
+            self._frame = self._render()
+        frame = self._frame.copy()
+        self._draw_clock(frame)
+        self.step += 1
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA), self.ground_truth()
+
+    def ground_truth(self):
+        truth = {}
+        for name, placements in self.placements.items():
+            truth[name] = [(x + sprite.shape[1] // 2, y + sprite.shape[0] // 2) for x, y, sprite in placements]
+        return truth
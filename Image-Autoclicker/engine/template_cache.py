@@ -0,0 +1,171 @@
+import os
+import copy
+import threading
+import logging
+import numpy as np
+import cv2
+
+# Пиксели прозрачнее порога не сравниваются: это фон под иконкой
+MASK_ALPHA_THRESHOLD = 128
+
+
+class Template:
+    def __init__(self, path, image, mtime, file_size, mask=None, color=None):
+        self.path = path
+        self.image = image
+        self.mtime = mtime
+        self.file_size = file_size
+        self.height, self.width = image.shape[:2]
+        self.scale = 1.0
+        # Метод сравнения: "ccoeff" (TM_CCOEFF_NORMED), "ccorr" или "sqdiff"
+        self.method = "ccoeff"
+        # mask - 255 для непрозрачных пикселей, None если шаблон непрозрачен целиком
+        self.mask = mask
+        # color - BGR-копия для цветовых режимов, None у серых файлов
+        self.color = color
+        mean, std = cv2.meanStdDev(image, mask=mask)
+        self.mean = float(mean[0][0])
+        pixels = self.width * self.height if mask is None else cv2.countNonZero(mask)
+        # Норма шаблона после вычитания среднего (знаменатель TM_CCOEFF_NORMED)
+        self.norm = float(std[0][0]) * pixels ** 0.5
+        self._pyramid = [image]
+        self._derived = {}
+        # Шаблон ищется из нескольких потоков сразу; блокировка общая с копиями
+        # with_method, у них общая пирамида. RLock - фабрики вызывают derived внутри derived
+        self._lock = threading.RLock()
+        if mask is not None:
+            self.masked(0)
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def pyramid(self, levels):
+        with self._lock:
+            while len(self._pyramid) <= levels:
+                self._pyramid.append(cv2.pyrDown(self._pyramid[-1]))
+            return self._pyramid[:levels + 1]
+
+    def with_method(self, method):
+        # Копия с другим методом сравнения делит с шаблоном пиксели и пирамиду
+        if method == self.method:
+            return self
+        def factory(template):
+            variant = copy.copy(template)
+            variant.method = method
+            variant._derived = {}
+            return variant
+        return self.derived(("method", method), factory)
+
+    def mask_at(self, level=0):
+        def factory(template):
+            image = template.pyramid(level)[level]
+            mask = cv2.resize(template.mask, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_AREA)
+            return cv2.threshold(mask, MASK_ALPHA_THRESHOLD - 1, 255, cv2.THRESH_BINARY)[1]
+        if self.mask is None or level == 0:
+            return self.mask
+        return self.derived(("mask", level), factory)
+
+    def masked(self, level=0):
+        # Для сравнения по маске: шаблон без среднего, обнулённый вне маски,
+        # маска весами, число пикселей и норма. Считается один раз на уровень пирамиды
+        def factory(template):
+            image = template.pyramid(level)[level]
+            weights = (template.mask_at(level) > 0).astype(np.float32)
+            count = max(1.0, float(weights.sum()))
+            zero_mean = (image.astype(np.float32) - float((image * weights).sum()) / count) * weights
+            norm = max(1e-3, float(np.sqrt((zero_mean * zero_mean).sum())))
+            return zero_mean, weights, count, norm
+        return self.derived(("masked", level), factory)
+
+    def derived(self, key, factory):
+        # Производные данные шаблона (подписи и т.п.) считаются один раз при загрузке
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = factory(self)
+            return self._derived[key]
+
+    def is_stale(self, stat):
+        return self.mtime != stat.st_mtime_ns or self.file_size != stat.st_size
+
+
+def alpha_mask(alpha):
+    mask = cv2.threshold(alpha, MASK_ALPHA_THRESHOLD - 1, 255, cv2.THRESH_BINARY)[1]
+    visible = cv2.countNonZero(mask)
+    # Непрозрачный (или целиком прозрачный) шаблон ищется обычным способом
+    if visible == mask.size or visible == 0:
+        return None
+    return mask
+
+
+def load_template_image(path):
+    # Шаблон читается с альфа-каналом: прозрачный фон превращается в маску
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None, None, None
+    if image.dtype == np.uint16:
+        image = cv2.convertScaleAbs(image, alpha=1.0 / 257)
+    if image.ndim == 2:
+        return image, None, None
+    if image.shape[2] == 4:
+        return (cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY), alpha_mask(image[:, :, 3]),
+                cv2.cvtColor(image, cv2.COLOR_BGRA2BGR))
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), None, image
+
+
+class TemplateCache:
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        # Меняется при любом изменении набора шаблонов
+        self.version = 0
+
+    def get(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logging.error(f"Template file not accessible: {path}: {e}")
+            self.invalidate(path)
+            return None
+
+        with self._lock:
+            template = self._templates.get(path)
+        if template is not None and not template.is_stale(stat):
+            return template
+
+        image, mask, color = load_template_image(path)
+        if image is None:
+            logging.error(f"Failed to load template image: {path}")
+            self.invalidate(path)
+            return None
+
+        template = Template(path, image, stat.st_mtime_ns, stat.st_size, mask, color)
+        with self._lock:
+            self._templates[path] = template
+            self.loads += 1
+            self.version += 1
+        logging.debug(f"Template loaded: {path} ({template.width}x{template.height}"
+                      f"{', masked' if mask is not None else ''})")
+        return template
+
+    def invalidate(self, path=None):
+        with self._lock:
+            self.version += 1
+            if path is None:
+                self._templates.clear()
+            else:
+                self._templates.pop(path, None)
+
+    def sync(self, paths):
+        # Удаляем шаблоны, которых больше нет в списке
+        keep = set(paths)
+        with self._lock:
+            self.version += 1
+            for path in list(self._templates):
+                if path not in keep:
+                    del self._templates[path]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._templates)
@@ -0,0 +1,109 @@
+import itertools
+import threading
+import logging
+import numpy as np
+import cv2
+from .detection import Detections, result_to_detections, correlate
+
+
+class TileState:
+    # Кадр из FrameBuffers перезаписывается, поэтому опорные пиксели копируются
+    # в собственный буфер шаблона
+    def __init__(self, template, frame, reference_id, result):
+        self.template = template
+        self.region = frame.region
+        self.reference = frame.gray.copy()
+        self.reference_id = reference_id
+        self.result = result
+        self.updates = 0
+
+    def set_reference(self, frame, reference_id):
+        np.copyto(self.reference, frame.gray)
+        self.region = frame.region
+        self.reference_id = reference_id
+
+
+def changed_integral(frame, state, threshold):
+    # Интегральное изображение маски изменённых пикселей: сумма по любому
+    # прямоугольнику считается за O(1); шаблоны с общим опорным кадром делят её
+    def factory(frame):
+        mask = cv2.threshold(cv2.absdiff(frame.gray, state.reference), threshold, 1, cv2.THRESH_BINARY)[1]
+        return cv2.integral(mask)
+    return frame.derived(("changed_integral", state.reference_id, threshold), factory)
+
+
+class TileMatcher:
+    def __init__(self, tile_size=256, threshold=8, refresh_every=50):
+        self.tile_size = tile_size
+        self.threshold = threshold
+        self.refresh_every = refresh_every
+        self.tiles_total = 0
+        self.tiles_matched = 0
+        self._states = {}
+        self._lock = threading.Lock()
+        self._reference_ids = itertools.count()
+
+    def _reference_id(self, frame):
+        return frame.derived("tile_reference_id", lambda frame: next(self._reference_ids))
+
+    def match(self, frame, template, threshold, max_detections):
+        if template.width > frame.width or template.height > frame.height:
+            logging.warning(f"Template {template.path} is larger than search region {frame.width}x{frame.height}")
+            return Detections()
+
+        with self._lock:
+            state = self._states.get(template.path)
+        if not self._can_update(state, frame, template):
+            if state is not None and state.template is template and state.reference.shape == frame.gray.shape:
+                # Полный пересчёт пишет в уже выделенные массивы
+                correlate(frame.gray, template, result=state.result, frame=frame)
+                state.set_reference(frame, self._reference_id(frame))
+                state.updates = 0
+            else:
+                result = correlate(frame.gray, template, frame=frame)
+                state = TileState(template, frame, self._reference_id(frame), result)
+            with self._lock:
+                self._states[template.path] = state
+        else:
+            self._update_dirty_tiles(state, frame, template)
+        return result_to_detections(state.result, template, threshold, max_detections)
+
+    def _can_update(self, state, frame, template):
+        if state is None or state.template is not template:
+            return False
+        if state.region != frame.region or state.reference.shape != frame.gray.shape:
+            return False
+        # Периодический полный пересчёт, чтобы не копились изменения ниже порога
+        return self.refresh_every <= 0 or state.updates < self.refresh_every
+
+    def _update_dirty_tiles(self, state, frame, template):
+        reference_id = self._reference_id(frame)
+        if state.reference_id == reference_id:
+            return
+        integral = changed_integral(frame, state, self.threshold)
+        result_height, result_width = state.result.shape
+        ty, tx = np.mgrid[0:result_height:self.tile_size, 0:result_width:self.tile_size]
+        ty, tx = ty.ravel(), tx.ravel()
+        # Тайл результата зависит от пикселей кадра под ним плюс размер шаблона
+        x1 = np.minimum(tx + self.tile_size, result_width)
+        y1 = np.minimum(ty + self.tile_size, result_height)
+        fx1 = x1 + template.width - 1
+        fy1 = y1 + template.height - 1
+        changed = integral[fy1, fx1] - integral[ty, fx1] - integral[fy1, tx] + integral[ty, tx]
+        dirty = np.flatnonzero(changed)
+
+        for i in dirty:
+            window = frame.gray[ty[i]:fy1[i], tx[i]:fx1[i]]
+            state.result[ty[i]:y1[i], tx[i]:x1[i]] = correlate(window, template)
+        state.set_reference(frame, reference_id)
+        state.updates += 1
+        with self._lock:
+            self.tiles_total += len(tx)
+            self.tiles_matched += len(dirty)
+
+    def forget(self, path=None):
+        with self._lock:
+            if path is None:
+                self._states.clear()
+            else:
+                self._states.pop(path, None)
@@ -0,0 +1,63 @@
+import threading
+import logging
+
+
+class TrackedHits:
+    def __init__(self, template, region, detections):
+        self.template = template
+        self.region = region
+        self.detections = detections
+        self.cycles_since_full = 0
+
+
+class HitTracker:
+    def __init__(self, padding=32, full_search_every=20):
+        self.padding = padding
+        self.full_search_every = full_search_every
+        self._hits = {}
+        self._lock = threading.Lock()
+
+    def windows(self, frame, template):
+        # None - нужен полный поиск по области
+        region = _region_key(frame.region)
+        with self._lock:
+            tracked = self._hits.get(template.path)
+            if tracked is None or tracked.template is not template or tracked.region != region:
+                return None
+            if self.full_search_every > 0 and tracked.cycles_since_full >= self.full_search_every:
+                return None
+            tracked.cycles_since_full += 1
+            detections = list(tracked.detections)
+
+        windows = []
+        for detection in detections:
+            x0 = max(0, detection.x - template.width // 2 - self.padding)
+            y0 = max(0, detection.y - template.height // 2 - self.padding)
+            x1 = min(frame.width, detection.x + (template.width + 1) // 2 + self.padding)
+            y1 = min(frame.height, detection.y + (template.height + 1) // 2 + self.padding)
+            windows.append((x0, y0, x1, y1))
+        return windows
+
+    def update(self, frame, template, detections, full_search):
+        with self._lock:
+            if not detections:
+                self._hits.pop(template.path, None)
+                return
+            tracked = self._hits.get(template.path)
+            if full_search or tracked is None:
+                tracked = TrackedHits(template, _region_key(frame.region), detections)
+                self._hits[template.path] = tracked
+                logging.debug(f"Tracking {len(detections)} hit(s) of {template.path}")
+            else:
+                tracked.detections = detections
+
+    def forget(self, path=None):
+        with self._lock:
+            if path is None:
+                self._hits.clear()
+            else:
+                self._hits.pop(path, None)
+
+
+def _region_key(region):
+    return region["left"], region["top"], region["width"], region["height"]
@@ -1,6 +1,5 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pyautogui
 import threading
 import time
 import os
@@ -17,9 +16,8 @@ import tempfile
 import webbrowser
 from gui_logic import save_settings, load_settings, apply_dark_theme, apply_light_theme
 from custom_widgets import CustomSlider, CustomButton, CustomNotebook, CustomDropdown, CustomSwitch, CustomListBox, CustomEntry, CustomHotkeyButton
+from engine import DetectionEngine, EngineConfig, TemplateCache, DEFAULT_DETECTION_SETTINGS
 import mss
-import numpy as np
-import cv2
 import keyboard
 import logging
 import atexit
@@ -72,6 +70,9 @@ DEFAULT_SETTINGS = {
     "last_image_path": "",
     "window_geometry": "750x847+590+59",
     "search_area": None,
+    "search_regions": [],
+    "template_regions": {},
+    "template_options": {},
     "click_conditions": {
         "min_images": 1,
         "click_if_not_found": False,
@@ -81,7 +82,8 @@ DEFAULT_SETTINGS = {
     "hotkeys": {
         "start": "f11",
         "stop": "f12"
-    }
+    },
+    "detection": dict(DEFAULT_DETECTION_SETTINGS)
 }
 
 class AutoclickerApp:
@@ -101,6 +103,7 @@ class AutoclickerApp:
         self.running = False
         self.image_paths = []
         self.temp_image_paths = []
+        self.template_cache = TemplateCache()
         self.load_images()
         self.is_minimized = False
         self.icon = None
@@ -120,6 +123,7 @@ class AutoclickerApp:
         self.hotkeys = self.settings.get("hotkeys", DEFAULT_SETTINGS["hotkeys"])
         self.waiting_for_hotkey = None
         self.total_clicks = 0
+        self.engine = None
         self.sct = mss.mss()
         self.monitors = self.sct.monitors
         self.setup_ui()
@@ -710,11 +714,13 @@ class AutoclickerApp:
                 try:
                     temp_path = os.path.join(tempfile.gettempdir(), f"autoclicker_temp_{len(self.temp_image_paths)}.png")
                     shutil.copy2(file, temp_path)
+                    self.template_cache.invalidate(temp_path)
                     self.image_paths.append(file)
                     self.temp_image_paths.append(temp_path)
                     self.image_listbox.insert(tk.END, os.path.basename(file))
                     self.settings["image_paths"] = self.image_paths
                     save_settings(self.settings)
+                    self.refresh_engine_config()
                     print(f"Listbox size after drop: {self.image_listbox.size()}")
                     self.image_listbox.update_canvas()
                 except Exception as e:
@@ -1028,6 +1034,7 @@ class AutoclickerApp:
         try:
             self.settings["sequence_mode"] = self.sequence_mode.get()
             save_settings(self.settings)
+            self.refresh_engine_config()
         except Exception as e:
             print(f"Error updating sequence mode: {e}")
 
@@ -1141,6 +1148,7 @@ class AutoclickerApp:
                 self.delay_d_text.set(f"{self.languages[lang]['delay_disappear']} {self.settings['delay_after_disappearance']:.2f}")
                 self.click_count_text.set(f"{self.languages[lang]['clicks_cycle']} {self.settings['clicks_per_cycle']}")
                 save_settings(self.settings)
+                self.refresh_engine_config()
         except Exception as e:
             print(f"Error updating values: {e}")
 
@@ -1150,11 +1158,13 @@ class AutoclickerApp:
             if file and file not in self.image_paths:
                 temp_path = os.path.join(tempfile.gettempdir(), f"autoclicker_temp_{len(self.temp_image_paths)}.png")
                 shutil.copy2(file, temp_path)
+                self.template_cache.invalidate(temp_path)
                 self.image_paths.append(file)
                 self.temp_image_paths.append(temp_path)
                 self.image_listbox.insert(tk.END, os.path.basename(file))
                 self.settings["image_paths"] = self.image_paths
                 save_settings(self.settings)
+                self.refresh_engine_config()
                 print(f"Listbox size after add: {self.image_listbox.size()}")
                 self.image_listbox.update_canvas()
         except Exception as e:
@@ -1167,11 +1177,13 @@ class AutoclickerApp:
                 index = selection[0]
                 self.image_listbox.delete(index)
                 temp_path = self.temp_image_paths.pop(index)
+                self.template_cache.invalidate(temp_path)
                 if os.path.exists(temp_path):
                     os.remove(temp_path)
                 self.image_paths.pop(index)
                 self.settings["image_paths"] = self.image_paths
                 save_settings(self.settings)
+                self.refresh_engine_config()
                 self.preview_label.config(image=None)
                 if not self.image_listbox.size():
                     self.is_preview_active = False
@@ -1193,8 +1205,10 @@ class AutoclickerApp:
                         os.remove(temp_path)
                 self.image_paths = []
                 self.temp_image_paths = []
+                self.template_cache.invalidate()
                 self.settings["image_paths"] = self.image_paths
                 save_settings(self.settings)
+                self.refresh_engine_config()
                 self.preview_label.config(image=None)
                 self.is_preview_active = False
                 print(f"Listbox size after clear: {self.image_listbox.size()}")
@@ -1223,11 +1237,13 @@ class AutoclickerApp:
             self.image_listbox.insert(index, item)
             self.temp_image_paths.insert(index, temp_path)
             self.image_paths.insert(index, orig_path)
+            self.template_cache.sync(self.temp_image_paths)
             self.image_listbox.selection_clear(0, tk.END)
             self.image_listbox.selection_set(index)
             self.drag_start_index = index
             self.settings["image_paths"] = self.image_paths
             save_settings(self.settings)
+            self.refresh_engine_config()
             print(f"Listbox size after drag: {self.image_listbox.size()}")
             self.image_listbox.update_canvas()
 
@@ -1321,12 +1337,14 @@ class AutoclickerApp:
             self.settings["search_area"] = self.search_area
             logging.info(f"Area selected: {self.search_area}")
         save_settings(self.settings)
+        self.refresh_engine_config()
         self.selection_window.destroy()
 
     def clear_area(self):
         self.search_area = None
         self.settings["search_area"] = None
         save_settings(self.settings)
+        self.refresh_engine_config()
         lang = self.settings["language"]
         messagebox.showinfo(
             title=self.languages[lang]["title"],
@@ -1466,6 +1484,7 @@ class AutoclickerApp:
             }
             self.settings["click_conditions"] = self.click_conditions
             save_settings(self.settings)
+            self.refresh_engine_config()
             window.destroy()
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numbers for minimum images and maximum clicks.")
@@ -1495,154 +1514,42 @@ class AutoclickerApp:
         lang = self.settings["language"]
         self.status_text.set(self.languages[lang]["status_running"])
         logging.info("Starting click process")
-        threading.Thread(target=self.click_images, daemon=True).start()
+        engine = DetectionEngine(self.build_engine_config(), template_cache=self.template_cache,
+                                 on_click=self.on_engine_click)
+        engine.on_stop = lambda: self.on_engine_stop(engine)
+        engine.total_clicks = self.total_clicks
+        self.engine = engine
+        engine.start()
 
     def stop_clicking(self):
         logging.debug("stop_clicking called")
         self.running = False
-        self.current_image_idx = 0
+        if self.engine is not None:
+            self.engine.stop()
         lang = self.settings["language"]
         self.status_text.set(self.languages[lang]["status_stopped"])
         logging.info("Clicking stopped, sequence index reset")
 
-    def click_images(self):
-        pyautogui.FAILSAFE = True
-        pyautogui.PAUSE = 0.01
-        sct = mss.mss()
-        current_image_idx = 0
-
-        monitors = sct.monitors
-        default_monitor = None
-        min_distance = float('inf')
-        for monitor in monitors[1:]:
-            distance = (monitor["left"] ** 2 + monitor["top"] ** 2) ** 0.5
-            if distance < min_distance:
-                min_distance = distance
-                default_monitor = monitor
-
-        if default_monitor is None:
-            logging.error("No monitors found. Stopping click process.")
-            self.stop_clicking()
-            return
-
-        screen_width, screen_height = default_monitor["width"], default_monitor["height"]
-        logging.info(f"Screen size: {screen_width}x{screen_height}")
-
-        while self.running:
-            found_positions = []
-            images_to_search = []
-
-            if self.sequence_mode.get():
-                if current_image_idx < len(self.temp_image_paths):
-                    images_to_search = [self.temp_image_paths[current_image_idx]]
-                else:
-                    current_image_idx = 0
-                    images_to_search = [self.temp_image_paths[current_image_idx]]
-            else:
-                images_to_search = self.temp_image_paths
-
-            if self.search_area is not None and "monitor_idx" in self.search_area and self.search_area[
-                "monitor_idx"] < len(self.monitors):
-                monitor = self.monitors[self.search_area["monitor_idx"]]
-                region = {
-                    "left": monitor["left"] + self.search_area["left"],
-                    "top": monitor["top"] + self.search_area["top"],
-                    "width": self.search_area["width"],
-                    "height": self.search_area["height"]
-                }
-                logging.debug(f"Search area: {region}")
-            else:
-                monitor = default_monitor
-                region = {
-                    "left": monitor["left"],
-                    "top": monitor["top"],
-                    "width": monitor["width"],
-                    "height": monitor["height"]
-                }
-                logging.debug(f"Using default monitor: {region}")
+    def build_engine_config(self):
+        return EngineConfig.from_settings(self.settings, image_paths=self.temp_image_paths)
 
-            if region["width"] <= 0 or region["height"] <= 0:
-                logging.error(f"Invalid region size: {region}. Stopping click process.")
-                self.stop_clicking()
-                break
+    def refresh_engine_config(self):
+        # Изменения списка и настроек подхватываются работающим движком
+        if self.engine is not None:
+            self.engine.update_config(self.build_engine_config())
 
-            for img_path in images_to_search:
-                try:
-                    template = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-                    if template is None:
-                        logging.error(f"Failed to load template image: {img_path}")
-                        continue
-
-                    screenshot = np.array(sct.grab(region))
-                    screenshot = cv2.cvtColor(screenshot, cv2.COLOR_BGRA2GRAY)
-
-                    result = cv2.matchTemplate(screenshot, template, cv2.TM_CCOEFF_NORMED)
-                    threshold = 0.7
-                    loc = np.where(result >= threshold)
-
-                    for pt in zip(*loc[::-1]):
-                        x = pt[0] + template.shape[1] // 2
-                        y = pt[1] + template.shape[0] // 2
-                        x += region["left"]
-                        y += region["top"]
-                        x -= default_monitor["left"]
-                        y -= default_monitor["top"]
-                        x = max(0, min(x, screen_width - 1))
-                        y = max(0, min(y, screen_height - 1))
-                        found_positions.append((x, y))
-
-                except Exception as e:
-                    logging.error(f"Error processing image {img_path}: {e}")
-
-            should_click = False
-            logging.debug(
-                f"Conditions check: min_images={self.click_conditions['min_images']}, found={len(found_positions)}, click_if_not_found={self.click_conditions['click_if_not_found']}")
-            if self.click_conditions["click_if_not_found"]:
-                should_click = len(found_positions) == 0
-            else:
-                should_click = len(found_positions) >= self.click_conditions["min_images"]
-
-            if should_click:
-                if self.click_conditions["max_clicks"] > 0 and self.total_clicks >= self.click_conditions["max_clicks"]:
-                    logging.info("Max clicks reached, stopping")
-                    self.stop_clicking()
-                    break
-
-                if found_positions or self.click_conditions["click_if_not_found"]:
-                    if not found_positions:
-                        if self.search_area is None:
-                            logging.warning("No search area for click_if_not_found, skipping")
-                            time.sleep(0.1)
-                            continue
-                        x = region["left"] + region["width"] // 2
-                        y = region["top"] + region["height"] // 2
-                        x -= default_monitor["left"]
-                        y -= default_monitor["top"]
-                        x = max(0, min(x, screen_width - 1))
-                        y = max(0, min(y, screen_height - 1))
-                    else:
-                        x, y = found_positions[0]
-
-                    for _ in range(int(self.settings["clicks_per_cycle"])):
-                        if not self.running:
-                            break
-                        pyautogui.click(x, y)
-                        self.total_clicks += 1
-                        lang = self.settings["language"]
-                        status = f"{self.languages[lang]['status_running']} ({self.total_clicks})"
-                        if self.sequence_mode.get():
-                            status += " (последовательный режим)"
-                        self.status_text.set(status)
-                        logging.info(f"Click at ({x}, {y}), total_clicks={self.total_clicks}")
-                        time.sleep(self.settings["delay_between_clicks"])
-                    if self.sequence_mode.get():
-                        current_image_idx += 1
-                    time.sleep(self.settings["delay_after_disappearance"])
-                else:
-                    time.sleep(0.1)
-            else:
-                time.sleep(0.1)
+    def on_engine_click(self, x, y, total_clicks):
+        self.total_clicks = total_clicks
+        lang = self.settings["language"]
+        status = f"{self.languages[lang]['status_running']} ({self.total_clicks})"
+        if self.settings.get("sequence_mode"):
+            status += " (последовательный режим)"
+        self.status_text.set(status)
 
+    def on_engine_stop(self, engine):
+        if engine is not self.engine:
+            return
+        self.running = False
         lang = self.settings["language"]
         self.status_text.set(self.languages[lang]["status_stopped"])
 